@@ -1,4 +1,5 @@
-from sqlmodel import SQLModel, Field, UniqueConstraint, Relationship
+from sqlmodel import SQLModel, Field, UniqueConstraint, Relationship, Column
+from geoalchemy2 import Geometry
 from uuid import uuid4, UUID
 from typing import Any
 from pydantic import model_validator
@@ -58,6 +59,14 @@ class Area(AreaBase, table=True):
         index=True,
         nullable=False,
     )
+    # Buffered convex hull of the points in the area (WGS84), maintained by
+    # app.areas.services.refresh_area_geometry. Excluded when an area is
+    # serialized nested in another model, AreaRead converts it to GeoJSON
+    geom: Any = Field(
+        default=None,
+        exclude=True,
+        sa_column=Column(Geometry("POLYGON", srid=4326)),
+    )
     sensors: list["Sensor"] = Relationship(
         back_populates="area",
         sa_relationship_kwargs={"lazy": "selectin"},
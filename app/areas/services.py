@@ -0,0 +1,86 @@
+from app.areas.models import Area
+from app.soil.profiles.models import SoilProfile
+from app.plots.models import Plot
+from app.sensors.models import Sensor
+from app.db import AsyncSession
+from uuid import UUID
+from typing import Iterable
+from sqlalchemy import select, update, union_all
+from sqlalchemy.sql import Select
+from geoalchemy2.functions import (
+    ST_ConvexHull,
+    ST_Collect,
+    ST_Transform,
+    ST_Buffer,
+)
+from app.config import config
+
+
+def convex_hull_query(area_ids: Iterable[UUID] | None = None) -> Select:
+    """Query the buffered convex hull of the points of each area
+
+    The points of the plots, soil profiles and sensors of an area are
+    combined, and a buffer is placed around their convex hull to ensure that
+    it covers the entire area, and that points and lines are always treated
+    as polygons. The hull is returned in WGS84.
+
+    If `area_ids` is given, only the points of those areas are read.
+    """
+
+    # Define the subqueries for each table, filtered on the areas so that
+    # each branch only reads the points it needs through the area_id index
+    subqueries = []
+    for model in (Plot, SoilProfile, Sensor):
+        subquery = select(
+            model.area_id.label("id"),
+            ST_Transform(model.geom, config.SRID).label("geom"),
+        )
+        if area_ids is not None:
+            subquery = subquery.where(model.area_id.in_(list(area_ids)))
+        else:
+            subquery = subquery.where(model.area_id.is_not(None))
+        subqueries.append(subquery)
+
+    # Combine the subqueries using UNION ALL
+    combined_subquery = union_all(*subqueries).subquery()
+
+    return select(
+        combined_subquery.c.id,
+        ST_Transform(
+            ST_Buffer(
+                ST_ConvexHull(ST_Collect(combined_subquery.c.geom)),
+                config.CONVEX_HULL_BUFFER,
+            ),
+            4326,
+        ).label("convex_hull"),
+    ).group_by(combined_subquery.c.id)
+
+
+async def refresh_area_geometry(
+    session: AsyncSession,
+    area_ids: Iterable[UUID | None],
+) -> None:
+    """Recompute the stored convex hull of the given areas
+
+    Call whenever plots, soil profiles or sensors of an area are created,
+    moved (including to another area) or deleted, before committing. Areas
+    left without any points have their geometry removed.
+    """
+
+    area_ids = {area_id for area_id in area_ids if area_id is not None}
+    if not area_ids:
+        return
+
+    # Make sure pending changes to the points are included in the hull
+    await session.flush()
+
+    hulls = convex_hull_query(area_ids).subquery()
+    await session.exec(
+        update(Area)
+        .where(Area.id.in_(area_ids))
+        .values(
+            geom=select(hulls.c.convex_hull)
+            .where(hulls.c.id == Area.id)
+            .scalar_subquery()
+        )
+    )
@@ -11,65 +11,21 @@ from app.db import get_session, AsyncSession
 from fastapi import Depends, APIRouter, Query, Response, HTTPException
 from uuid import UUID
 from app.crud import CRUD
-from sqlmodel import select
-from sqlalchemy import select
-from geoalchemy2 import Geography
-from geoalchemy2.functions import (
-    ST_ConvexHull,
-    ST_Collect,
-    ST_Transform,
-    ST_MinimumBoundingCircle,
-    ST_Buffer,
+from app.references.services import (
+    area_cache,
+    invalidate_references,
 )
-from sqlalchemy.sql import select as sql_select
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy.sql.expression import func
-from sqlalchemy import union_all
-from app.config import config
+from app.utils.validators import validate_with_geometries
+from app.utils.responses import CachedRoute
+from app.projects.models import Project
+from app.plots.samples.models import PlotSample
+from app.transects.models.transects import Transect
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 crud = CRUD(Area, AreaRead, AreaCreate, AreaUpdate)
 
-
-async def get_convex_hull(session: AsyncSession):
-    # Define the subqueries for each table
-    plot_subquery = select(
-        Area.id.label("id"), ST_Transform(Plot.geom, config.SRID).label("geom")
-    ).join(Plot, Area.id == Plot.area_id)
-
-    soilprofile_subquery = select(
-        Area.id.label("id"),
-        ST_Transform(SoilProfile.geom, config.SRID).label("geom"),
-    ).join(SoilProfile, Area.id == SoilProfile.area_id)
-
-    sensor_subquery = select(
-        Area.id.label("id"),
-        ST_Transform(Sensor.geom, config.SRID).label("geom"),
-    ).join(Sensor, Area.id == Sensor.area_id)
-
-    # Combine the subqueries using UNION ALL
-    combined_subquery = union_all(
-        plot_subquery, soilprofile_subquery, sensor_subquery
-    ).subquery()
-
-    # Define the main query to group by area id and compute the convex hull
-    # And place a buffer around the convex hull to ensure that the convex hull
-    # covers the entire area, and that points and lines are always treated as
-    # polygons
-
-    main_query = select(
-        combined_subquery.c.id,
-        ST_Transform(
-            ST_Buffer(
-                ST_ConvexHull(ST_Collect(combined_subquery.c.geom)),
-                config.CONVEX_HULL_BUFFER,
-            ),
-            4326,
-        ).label("convex_hull"),
-    ).group_by(combined_subquery.c.id)
-
-    geometry_results = await session.exec(main_query)
-    return geometry_results.all()
+# Models nested in the area responses
+RELATED = [Project, Plot, PlotSample, Sensor, SoilProfile, Transect]
 
 
 async def get_count(
@@ -103,17 +59,19 @@ async def get_data(
         session=session,
     )
 
-    geometry = await get_convex_hull(session)
+    # Decode the points of all areas in the page together
+    geoms = [
+        obj.geom
+        for area in res
+        for obj in (
+            *area.plots,
+            *area.sensors,
+            *area.soil_profiles,
+            *(node for transect in area.transects for node in transect.nodes),
+        )
+    ]
 
-    area_objs = []
-    for area in res:
-        area = AreaRead.model_validate(area)
-        for geom in geometry:
-            if area.id == geom.id:
-                area.geom = geom.convex_hull
-        area_objs.append(area)
-
-    return area_objs
+    return validate_with_geometries(AreaRead, res, geoms)
 
 
 async def get_one(
@@ -128,41 +86,31 @@ async def get_one(
     return res
 
 
-@router.get("/{area_id}", response_model=AreaRead)
+@router.get(
+    "/{area_id}",
+    response_model=AreaRead,
+    dependencies=[Depends(crud.detail_etag(related=RELATED))],
+)
 async def get_area(
     obj: CRUD = Depends(get_one),
-    session: AsyncSession = Depends(get_session),
 ) -> AreaRead:
     """Get an area by id"""
 
-    geometry = await get_convex_hull(session)
-
-    for geom in geometry:
-        if obj.id == geom.id:
-            obj = AreaRead.model_validate(obj)
-            obj.geom = geom.convex_hull
-            break
     return obj
 
 
-@router.get("", response_model=list[AreaRead])
+@router.get(
+    "",
+    response_model=list[AreaRead],
+    dependencies=[Depends(crud.list_etag(related=RELATED))],
+)
 async def get_all_areas(
     response: Response,
     areas: CRUD = Depends(get_data),
     total_count: int = Depends(get_count),
-    session: AsyncSession = Depends(get_session),
 ) -> list[AreaRead]:
     """Get all Area data"""
 
-    for res in areas:
-        geometry = await get_convex_hull(session)
-
-        for geom in geometry:
-            if res.id == geom.id:
-                res = AreaRead.model_validate(res)
-                res.geom = geom.convex_hull
-                break
-
     return areas
 
 
@@ -177,6 +125,7 @@ async def create_area(
 
     session.add(obj)
 
+    await invalidate_references(session, area_cache)
     await session.commit()
     await session.refresh(obj)
 
@@ -196,17 +145,10 @@ async def update_area(
     area.sqlmodel_update(update_data)
 
     session.add(area)
+    await invalidate_references(session, area_cache)
     await session.commit()
     await session.refresh(area)
 
-    geometry = await get_convex_hull(session)
-
-    for geom in geometry:
-        if area.id == geom.id:
-            area = AreaRead.model_validate(area)
-            area.geom = geom.convex_hull
-            break
-
     return area
 
 
@@ -222,6 +164,7 @@ async def delete_batch(
         if obj:
             await session.delete(obj)
 
+    await invalidate_references(session, area_cache)
     await session.commit()
 
     return [str(obj_id) for obj_id in ids]
@@ -235,6 +178,7 @@ async def delete_area(
     """Delete an area by id"""
 
     await session.delete(area)
+    await invalidate_references(session, area_cache)
     await session.commit()
 
     return {"ok": True}
@@ -0,0 +1,148 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException
+from sqlmodel import SQLModel
+from typing import Any, Callable
+from app.config import config
+import asyncio
+import functools
+import time
+
+
+class TaskMetrics(SQLModel):
+    """Timing metrics accumulated for one task (function) in a pool"""
+
+    pool: str
+    task: str
+    calls: int = 0
+    failures: int = 0
+    total_wait_seconds: float = 0.0  # Time spent waiting for a free slot
+    total_run_seconds: float = 0.0  # Time spent executing (incl. transfer)
+    max_run_seconds: float = 0.0
+
+
+class ComputePool:
+    """An executor with a bounded queue and per-task timing metrics
+
+    The executor is created lazily on first use so that importing the module
+    does not spawn processes or threads. At most `max_workers + max_queued`
+    tasks are in flight at any time, further callers wait (without blocking
+    the event loop) for a slot and receive a 503 after `queue_timeout`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        executor_class: type[Executor],
+        max_workers: int,
+        max_queued: int,
+        queue_timeout: float,
+    ):
+        self.name = name
+        self.executor_class = executor_class
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.metrics: dict[str, TaskMetrics] = {}
+
+        self._executor: Executor | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self.executor_class(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run the function in the pool and await its result"""
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queued)
+
+        task_name = getattr(func, "__qualname__", repr(func))
+        metrics = self.metrics.setdefault(
+            task_name, TaskMetrics(pool=self.name, task=task_name)
+        )
+
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                self._slots.acquire(), timeout=self.queue_timeout
+            )
+        except asyncio.TimeoutError:
+            metrics.failures += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy processing other requests, try again",
+            )
+
+        started_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(func, *args, **kwargs)
+            )
+        except Exception:
+            metrics.failures += 1
+            raise
+        finally:
+            self._slots.release()
+
+            run_time = time.perf_counter() - started_at
+            metrics.calls += 1
+            metrics.total_wait_seconds += started_at - queued_at
+            metrics.total_run_seconds += run_time
+            metrics.max_run_seconds = max(metrics.max_run_seconds, run_time)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Process pool for NumPy/SciPy/PIL work that holds the GIL
+process_pool = ComputePool(
+    "process",
+    ProcessPoolExecutor,
+    max_workers=config.COMPUTE_PROCESS_WORKERS,
+    max_queued=config.COMPUTE_MAX_QUEUED,
+    queue_timeout=config.COMPUTE_QUEUE_TIMEOUT,
+)
+
+# Thread pool for calls that release the GIL (I/O, C extensions)
+thread_pool = ComputePool(
+    "thread",
+    ThreadPoolExecutor,
+    max_workers=config.COMPUTE_THREAD_WORKERS,
+    max_queued=config.COMPUTE_MAX_QUEUED,
+    queue_timeout=config.COMPUTE_QUEUE_TIMEOUT,
+)
+
+
+async def run_in_process(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a CPU-bound function in the process pool
+
+    The function and its arguments must be picklable, so use module level
+    functions and pass plain data (NumPy arrays, lists, strings).
+    """
+
+    return await process_pool.run(func, *args, **kwargs)
+
+
+async def run_in_thread(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a function that releases the GIL in the thread pool"""
+
+    return await thread_pool.run(func, *args, **kwargs)
+
+
+def get_metrics() -> list[TaskMetrics]:
+    """Return the timing metrics of all tasks run in both pools"""
+
+    return list(process_pool.metrics.values()) + list(
+        thread_pool.metrics.values()
+    )
+
+
+def shutdown() -> None:
+    process_pool.shutdown()
+    thread_pool.shutdown()
@@ -17,6 +17,51 @@ class Config(BaseSettings):
 
     # Instrument settings
     INSTRUMENT_PLOT_DOWNSAMPLE_THRESHOLD: int = 50
+    INSTRUMENT_BASELINE_CACHE_MAX_ENTRIES: int = 256  # Cached baseline fits
+    INSTRUMENT_BASELINE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Elevation settings
+    ELEVATION_PROVIDER: str = "swisstopo"  # swisstopo | dem
+    ELEVATION_DEM_PATH: str | None = None  # Directory of .hdr/.flt DEM tiles
+    ELEVATION_SWISSTOPO_URL: str = (
+        "https://api3.geo.admin.ch/rest/services/height"
+    )
+    ELEVATION_MAX_CONCURRENCY: int = 8  # Requests in flight to the provider
+    ELEVATION_MAX_ATTEMPTS: int = 5  # Per point, with exponential backoff
+    ELEVATION_REQUEST_TIMEOUT: float = 10.0  # Seconds
+    ELEVATION_CACHE_DECIMALS: int = 1  # Rounding of cached coordinates (m)
+
+    # Sample depth profile settings
+    DEPTH_PROFILE_CACHE_MAX_ENTRIES: int = 1024  # Cached plot profiles
+    DEPTH_PROFILE_MAX_STEPS: int = 1000  # Steps of the depth grid
+
+    # Slope settings
+    SLOPE_CACHE_MAX_ENTRIES: int = 100000  # Points with a cached slope class
+
+    # Vector tile settings
+    TILE_CACHE_MAX_ENTRIES: int = 4096  # Cached vector tiles (all layers)
+    TILE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    TILE_VERSION_TTL: float = 5  # Seconds to reuse a layer version
+
+    # Response cache settings (ETag revalidation is always enabled)
+    RESPONSE_CACHE_TTL: float = 0  # Seconds to keep list/detail responses
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Response compression settings (brotli is preferred over gzip)
+    COMPRESSION_MIN_SIZE: int = 1024  # Smaller bodies are sent uncompressed
+    COMPRESSION_GZIP_LEVEL: int = 6  # 1 (fastest) to 9 (smallest)
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0 (fastest) to 11 (smallest)
+    COMPRESSION_THREAD_MIN_SIZE: int = 256 * 1024  # Compressed off the loop
+
+    # Export settings
+    CSV_EXPORT_BLOCK_SIZE: int = 10000  # Rows formatted at once when streaming
+
+    # Compute executor settings (CPU-heavy work is kept off the event loop)
+    COMPUTE_PROCESS_WORKERS: int = 2  # Processes for NumPy/SciPy/PIL work
+    COMPUTE_THREAD_WORKERS: int = 4  # Threads for calls releasing the GIL
+    COMPUTE_MAX_QUEUED: int = 32  # Tasks that may wait for a worker per pool
+    COMPUTE_QUEUE_TIMEOUT: float = 30.0  # Seconds to wait for a free slot
 
     # PostGIS settings
     DB_HOST: str | None = None
@@ -1,12 +1,65 @@
 from app.db import get_session, AsyncSession
-from fastapi import Depends, Response
+from fastapi import Depends, Query, Request, Response
 from sqlmodel import select
-from typing import Any
+from typing import Any, Callable
 import json
 from sqlalchemy.sql import func
-from sqlalchemy import or_, cast, String
+from sqlalchemy import or_, cast, String, values, column, update
 from uuid import UUID
 from sqlmodel import SQLModel
+from app.utils.projection import WGS84_SRID
+from app.exceptions import ValidationError
+from app.utils.responses import check_etag, weak_etag
+from geoalchemy2 import Geography
+
+
+def point_coordinate_columns(geom: Any) -> list[Any]:
+    """Columns selecting the coordinates of a point in its own SRID and WGS84
+
+    Labelled coord_x, coord_y, coord_z, longitude and latitude, in that order.
+    """
+
+    wgs84 = func.ST_Transform(geom, WGS84_SRID)
+
+    return [
+        func.ST_X(geom).label("coord_x"),
+        func.ST_Y(geom).label("coord_y"),
+        func.ST_Z(geom).label("coord_z"),
+        func.ST_X(wgs84).label("longitude"),
+        func.ST_Y(wgs84).label("latitude"),
+    ]
+
+
+SPATIAL_FILTERS = ("bbox", "near", "within_area")
+
+MAX_BIND_PARAMETERS = 32767  # Per statement, in the PostgreSQL protocol
+
+
+def parse_spatial_filter(
+    field: str,
+    value: Any,
+    names: list[str],
+) -> list[float]:
+    """Parse the numbers of a spatial filter, optionally followed by an SRID
+
+    Accepts a list or a comma separated string.
+    """
+
+    if isinstance(value, str):
+        value = value.split(",")
+
+    try:
+        numbers = [float(number) for number in value]
+    except (TypeError, ValueError):
+        numbers = []
+
+    if len(numbers) not in (len(names), len(names) + 1):
+        raise ValidationError(
+            loc=["query", "filter", field],
+            msg=f"Expected {','.join(names)}[,srid]",
+        )
+
+    return numbers
 
 
 class CRUD:
@@ -61,28 +114,24 @@ class CRUD:
 
         return uuid_properties
 
-    async def get_model_data(
+    def apply_filter(
         self,
-        filter: str,
-        sort: str,
-        range: str,
+        query: Any,
+        filter: dict,
         filter_models_to_join: list[SQLModel] = [],
         filter_fields_to_query: list[SQLModel] = [],
-        session: AsyncSession = Depends(get_session),
-    ) -> list:
-        """Returns the data of a model with a filter applied
+    ) -> Any:
+        """Apply the filters of a list request to a query
 
-        Similar to the count query except returns the data instead of the count
+        Shared by the data and count queries so both select the same rows
         """
 
-        sort = json.loads(sort) if sort else []
-        range = json.loads(range) if range else []
-        filter = json.loads(filter) if filter else {}
-
-        query = select(self.db_model)
-
         if len(filter):
             for field, value in filter.items():
+                if field in SPATIAL_FILTERS:
+                    query = query.filter(self.spatial_filter(field, value))
+                    continue
+
                 if field == "q":
                     # If the field is 'q', do a full-text search on the
                     # searchable fields
@@ -154,13 +203,124 @@ class CRUD:
                         )
                     else:
                         # Apply a LIKE filter for string matching
-                        print(field)
                         query = query.filter(
                             func.coalesce(
                                 getattr(self.db_model, field), ""
                             ).ilike(f"%{str(value)}%")
                         )
 
+        return query
+
+    def spatial_filter(self, field: str, value: Any) -> Any:
+        """Translate a spatial filter to a condition on the geom column
+
+        - bbox: [minx, miny, maxx, maxy, srid?] or "minx,miny,maxx,maxy"
+        - near: [x, y, radius, srid?] or "x,y,radius", radius in metres
+        - within_area: the id of an area, matches inside the area's hull
+
+        Coordinates are in WGS84 unless an SRID is given. The filter value is
+        transformed to the SRID of the column (rather than the column to the
+        SRID of the value) so that the GiST index on the column can be used.
+        """
+
+        geom = getattr(self.db_model, "geom", None)
+        if geom is None:
+            raise ValidationError(
+                loc=["query", "filter", field],
+                msg=f"{self.db_model.__name__} has no geometry to filter on",
+            )
+        srid = geom.type.srid
+
+        if field == "bbox":
+            minx, miny, maxx, maxy, *input_srid = parse_spatial_filter(
+                field, value, ["minx", "miny", "maxx", "maxy"]
+            )
+            envelope = func.ST_MakeEnvelope(
+                minx,
+                miny,
+                maxx,
+                maxy,
+                int(input_srid[0]) if input_srid else WGS84_SRID,
+            )
+
+            return func.ST_Intersects(geom, func.ST_Transform(envelope, srid))
+
+        if field == "near":
+            x, y, radius, *input_srid = parse_spatial_filter(
+                field, value, ["x", "y", "radius"]
+            )
+            point = func.ST_Transform(
+                func.ST_SetSRID(
+                    func.ST_MakePoint(x, y),
+                    int(input_srid[0]) if input_srid else WGS84_SRID,
+                ),
+                srid,
+            )
+
+            if srid == WGS84_SRID:
+                # Degrees are not a distance, measure on the spheroid
+                return func.ST_DWithin(
+                    cast(geom, Geography(srid=WGS84_SRID)),
+                    cast(point, Geography(srid=WGS84_SRID)),
+                    radius,
+                )
+
+            return func.ST_DWithin(geom, point, radius)
+
+        # within_area
+        try:
+            area_id = UUID(str(value))
+        except ValueError:
+            raise ValidationError(
+                loc=["query", "filter", field],
+                msg=f"Invalid area id: {value}",
+            )
+
+        # Look up the table through the metadata to avoid a circular import
+        area = SQLModel.metadata.tables["area"].alias("filter_area")
+        area_geom = select(area.c.geom).where(area.c.id == area_id)
+
+        return func.ST_Intersects(
+            geom, func.ST_Transform(area_geom.scalar_subquery(), srid)
+        )
+
+    async def get_model_data(
+        self,
+        filter: str,
+        sort: str,
+        range: str,
+        filter_models_to_join: list[SQLModel] = [],
+        filter_fields_to_query: list[SQLModel] = [],
+        session: AsyncSession = Depends(get_session),
+        point_coordinates: bool = False,
+    ) -> list:
+        """Returns the data of a model with a filter applied
+
+        Similar to the count query except returns the data instead of the count
+
+        With `point_coordinates` the coordinates of the model's point geometry
+        are computed in the query, and rows of the object followed by its
+        coord_x, coord_y, coord_z, longitude and latitude are returned.
+        """
+
+        sort = json.loads(sort) if sort else []
+        range = json.loads(range) if range else []
+        filter = json.loads(filter) if filter else {}
+
+        if point_coordinates:
+            query = select(
+                self.db_model, *point_coordinate_columns(self.db_model.geom)
+            )
+        else:
+            query = select(self.db_model)
+
+        query = self.apply_filter(
+            query,
+            filter,
+            filter_models_to_join=filter_models_to_join,
+            filter_fields_to_query=filter_fields_to_query,
+        )
+
         if len(sort) == 2:
             sort_field, sort_order = sort
             if sort_order == "ASC":
@@ -195,85 +355,12 @@ class CRUD:
         range = json.loads(range) if range else []
 
         query = select(func.count(self.db_model.iterator))
-        if len(filter):
-            for field, value in filter.items():
-                if field == "q":
-                    # If the field is 'q', do a full-text search on the
-                    # searchable fields
-                    or_conditions = []
-                    for (
-                        prop_name,
-                        prop_details,
-                    ) in self.db_model.model_json_schema()[
-                        "properties"
-                    ].items():
-
-                        column = cast(
-                            getattr(self.db_model, prop_name), String
-                        )
-                        or_conditions.append(
-                            func.coalesce(column, "").ilike(f"%{str(value)}%")
-                        )
-
-                    # continue
-                    if filter_fields_to_query and filter_models_to_join:
-                        for model in filter_models_to_join:
-                            query = query.join(model)
-                        for field_to_query in filter_fields_to_query:
-                            or_conditions.append(
-                                field_to_query.ilike(f"%{value}%")
-                            )
-
-                    query = query.filter(or_(*or_conditions))
-                    continue
-
-                if field in self.exact_match_fields:
-                    if isinstance(value, list):
-                        # Combine multiple filters with OR
-                        or_conditions = []
-                        for v in value:
-                            or_conditions.append(
-                                getattr(self.db_model, field) == v
-                            )
-
-                        query = query.filter(or_(*or_conditions))
-                    else:
-                        # If it's not a list, apply a simple equality filter
-                        query = query.filter(
-                            getattr(self.db_model, field) == value
-                        )
-                else:
-                    if isinstance(value, list):
-                        or_conditions = []
-                        for v in value:
-                            or_conditions.append(
-                                getattr(self.db_model, field).ilike(
-                                    f"%{str(v)}%"
-                                )
-                            )
-
-                        query = query.filter(or_(*or_conditions))
-                    elif isinstance(value, bool):
-                        if value is True:
-                            # If true, the field has a value and the value
-                            query = query.filter(
-                                getattr(self.db_model, field).has()
-                            )
-                        else:
-                            query = query.filter(
-                                ~getattr(self.db_model, field).has()
-                            )
-                    elif isinstance(value, int):
-                        query = query.filter(
-                            getattr(self.db_model, field) == value
-                        )
-                    else:
-                        # Apply a LIKE filter for string matching
-                        query = query.filter(
-                            func.coalesce(
-                                getattr(self.db_model, field), ""
-                            ).ilike(f"%{str(value)}%")
-                        )
+        query = self.apply_filter(
+            query,
+            filter,
+            filter_models_to_join=filter_models_to_join,
+            filter_fields_to_query=filter_fields_to_query,
+        )
 
         count = await session.exec(query)
         total_count = count.one()
@@ -289,6 +376,133 @@ class CRUD:
 
         return total_count
 
+    async def get_version(
+        self,
+        session: AsyncSession,
+        *,
+        filter: dict | None = None,
+        model_id: UUID | None = None,
+        filter_models_to_join: list[SQLModel] = [],
+        filter_fields_to_query: list[SQLModel] = [],
+        related: list[SQLModel] = [],
+        children: list[Any] = [],
+    ) -> tuple:
+        """Version of the rows of a list (with a filter) or of one model
+
+        The count and latest last_updated of the rows, followed by those of
+        each related model (whole tables), in one query. Changes whenever a
+        row is added, updated or removed. For one model, `children` are the
+        foreign key columns of the rows nested in it (ie. SensorData
+        .sensor_id), only the rows referencing the model are versioned.
+        """
+
+        query = select(
+            func.count(self.db_model.id), func.max(self.db_model.last_updated)
+        )
+        if model_id is not None:
+            query = query.where(self.db_model.id == model_id)
+        else:
+            query = self.apply_filter(
+                query,
+                filter or {},
+                filter_models_to_join=filter_models_to_join,
+                filter_fields_to_query=filter_fields_to_query,
+            )
+
+        for model in related:
+            query = query.add_columns(
+                select(func.count(model.id)).correlate(None).scalar_subquery(),
+                select(func.max(model.last_updated))
+                .correlate(None)
+                .scalar_subquery(),
+            )
+        for foreign_key in children:
+            child = foreign_key.class_
+            query = query.add_columns(
+                select(func.count(child.id))
+                .where(foreign_key == model_id)
+                .correlate(None)
+                .scalar_subquery(),
+                select(func.max(child.last_updated))
+                .where(foreign_key == model_id)
+                .correlate(None)
+                .scalar_subquery(),
+            )
+
+        res = await session.exec(query)
+
+        return tuple(res.one())
+
+    def list_etag(
+        self,
+        filter_models_to_join: list[SQLModel] = [],
+        filter_fields_to_query: list[SQLModel] = [],
+        related: list[SQLModel] = [],
+    ) -> Callable:
+        """Dependency answering conditional requests of a list route
+
+        The weak ETag is derived from the version of the filtered rows and
+        of the related models nested in the response, and the query string.
+        Add it to the dependencies of the route so it runs before the rows
+        are loaded (see check_etag).
+        """
+
+        async def etag(
+            request: Request,
+            response: Response,
+            filter: str = Query(None),
+            session: AsyncSession = Depends(get_session),
+        ) -> None:
+            version = await self.get_version(
+                session,
+                filter=json.loads(filter) if filter else {},
+                filter_models_to_join=filter_models_to_join,
+                filter_fields_to_query=filter_fields_to_query,
+                related=related,
+            )
+            check_etag(
+                request,
+                response,
+                weak_etag(request.url.path, request.url.query, *version),
+            )
+
+        return etag
+
+    def detail_etag(
+        self,
+        related: list[SQLModel] = [],
+        children: list[Any] = [],
+    ) -> Callable:
+        """Dependency answering conditional requests of a detail route
+
+        As list_etag, with the version of the row of the id in the path and
+        of its children (see get_version).
+        """
+
+        async def etag(
+            request: Request,
+            response: Response,
+            session: AsyncSession = Depends(get_session),
+        ) -> None:
+            try:
+                model_id = UUID(next(iter(request.path_params.values())))
+            except (StopIteration, ValueError):
+                return  # Left to the validation of the route
+
+            version = await self.get_version(
+                session, model_id=model_id, related=related, children=children
+            )
+            if not version[0]:
+                return  # Not found, left to the route
+
+            check_etag(
+                request,
+                response,
+                weak_etag(request.url.path, request.url.query, *version),
+            )
+
+        return etag
+
     async def get_model_by_id(
         self,
         session: AsyncSession,
@@ -318,3 +532,70 @@ class CRUD:
         await session.refresh(obj)
 
         return obj
+
+    async def bulk_update(
+        self,
+        session: AsyncSession,
+        updates: list[dict],
+    ) -> list[UUID]:
+        """Apply partial updates to many rows, keyed by their id
+
+        Updates are grouped by the set of columns they change, and each group
+        is applied with one UPDATE ... FROM (VALUES ...) statement (split in
+        chunks within the bind parameter limit). Keys that are not columns of
+        the table are ignored. Rows are only written when a value is distinct
+        from the stored one, and the ids of those rows are returned. The
+        caller commits.
+        """
+
+        table = self.db_model.__table__
+
+        groups: dict[tuple[str, ...], list[dict]] = {}
+        for row in updates:
+            fields = tuple(
+                sorted(
+                    field
+                    for field in row
+                    if field in table.c and field not in ("id", "iterator")
+                )
+            )
+            if fields:
+                groups.setdefault(fields, []).append(row)
+
+        changed = []
+        for fields, rows in groups.items():
+            names = ["id", *fields]
+            chunk_size = MAX_BIND_PARAMETERS // len(names)
+            for start in range(0, len(rows), chunk_size):
+                data = values(
+                    *[column(name, table.c[name].type) for name in names],
+                    name="data",
+                ).data(
+                    [
+                        tuple(row[name] for name in names)
+                        for row in rows[start : start + chunk_size]
+                    ]
+                )
+                # Cast as columns of NULLs only in VALUES are typed as text
+                new = {
+                    field: cast(data.c[field], table.c[field].type)
+                    for field in fields
+                }
+
+                res = await session.exec(
+                    update(table)
+                    .where(table.c.id == data.c.id)
+                    .where(
+                        or_(
+                            *[
+                                table.c[field].is_distinct_from(value)
+                                for field, value in new.items()
+                            ]
+                        )
+                    )
+                    .values(new)
+                    .returning(table.c.id)
+                )
+                changed.extend(res.scalars().all())
+
+        return changed
@@ -0,0 +1,45 @@
+from sqlmodel import SQLModel, Field, UniqueConstraint
+from sqlalchemy.sql import func
+import datetime
+
+
+class ElevationCache(SQLModel, table=True):
+    """Elevations resolved by a provider, by coordinates rounded to
+    ELEVATION_CACHE_DECIMALS in config.SRID
+    """
+
+    __table_args__ = (
+        UniqueConstraint("provider", "x", "y", name="unique_elevation_point"),
+    )
+    iterator: int = Field(
+        default=None,
+        nullable=False,
+        primary_key=True,
+        index=True,
+    )
+    provider: str = Field(nullable=False)
+    x: float = Field(nullable=False)
+    y: float = Field(nullable=False)
+    elevation: float = Field(nullable=False)
+    last_updated: datetime.datetime = Field(
+        default_factory=datetime.datetime.now,
+        title="Last Updated",
+        description="Date and time when the record was last updated",
+        sa_column_kwargs={
+            "onupdate": func.now(),
+            "server_default": func.now(),
+        },
+    )
+
+
+class Elevation(SQLModel):
+    elevation: float
+
+
+class ElevationPointCreate(SQLModel):
+    x: float
+    y: float
+
+
+class ElevationPointRead(ElevationPointCreate):
+    elevation: float | None = None  # None where no elevation is available
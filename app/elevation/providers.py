@@ -0,0 +1,233 @@
+from abc import ABC, abstractmethod
+from app.compute import run_in_thread
+from app.config import config
+from pathlib import Path
+import asyncio
+import httpx
+import numpy as np
+import tenacity
+
+
+class ElevationProvider(ABC):
+    """A source of elevations for points in config.SRID
+
+    Providers return NaN for points they have no elevation for, and raise
+    for failures that may succeed later (network errors, rate limits).
+    """
+
+    name: str
+    cacheable: bool = True  # Store the results in the elevation cache table
+
+    @abstractmethod
+    async def get_elevations(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Get the elevation (metres) of each point"""
+
+    async def close(self) -> None:
+        """Release any resources held by the provider"""
+
+
+class SwisstopoProvider(ElevationProvider):
+    """Elevations from the swisstopo height API, one request per point
+
+    Requests share one pooled HTTP client, at most `max_concurrency` are in
+    flight at a time, and failed requests are retried with exponential
+    backoff.
+    """
+
+    name = "swisstopo"
+
+    def __init__(
+        self,
+        url: str = config.ELEVATION_SWISSTOPO_URL,
+        max_concurrency: int = config.ELEVATION_MAX_CONCURRENCY,
+        max_attempts: int = config.ELEVATION_MAX_ATTEMPTS,
+        timeout: float = config.ELEVATION_REQUEST_TIMEOUT,
+    ):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+        self._client: httpx.AsyncClient | None = None
+        self._requests: asyncio.Semaphore | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency),
+            )
+        return self._client
+
+    async def get_elevation(self, x: float, y: float) -> float:
+        if self._requests is None:
+            self._requests = asyncio.Semaphore(self.max_concurrency)
+
+        async for attempt in tenacity.AsyncRetrying(
+            stop=tenacity.stop_after_attempt(self.max_attempts),
+            wait=tenacity.wait_exponential(multiplier=0.5, max=10),
+            retry=tenacity.retry_if_exception_type(httpx.HTTPError),
+            reraise=True,
+        ):
+            with attempt:
+                async with self._requests:
+                    response = await self.client.get(
+                        self.url,
+                        params={
+                            "easting": x,
+                            "northing": y,
+                            "sr": config.SRID,
+                            "format": "json",
+                        },
+                    )
+
+                # Retry on rate limiting and server errors only, other
+                # responses mean there is no elevation for the point
+                if response.status_code == 429 or response.is_server_error:
+                    response.raise_for_status()
+
+        height = response.json().get("height") if response.is_success else None
+
+        return float(height) if height is not None else np.nan
+
+    async def get_elevations(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        elevations = await asyncio.gather(
+            *[self.get_elevation(float(x_), float(y_)) for x_, y_ in zip(x, y)]
+        )
+
+        return np.asarray(elevations, dtype=float)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class DEMTile:
+    """A tile of an ESRI float grid (EHdr .hdr/.flt pair) in config.SRID
+
+    The data is memory-mapped, only the pages holding the requested cells
+    are read from disk.
+    """
+
+    def __init__(self, header_path: Path):
+        header = {}
+        for line in header_path.read_text().splitlines():
+            if line.strip():
+                key, value = line.split(maxsplit=1)
+                header[key.upper()] = value.strip()
+
+        self.nrows = int(header["NROWS"])
+        self.ncols = int(header["NCOLS"])
+        self.cellsize = float(header["CELLSIZE"])
+        self.nodata = float(header.get("NODATA_VALUE", np.nan))
+
+        # The origin is either the corner or the centre of the lower left cell
+        if "XLLCENTER" in header:
+            self.xmin = float(header["XLLCENTER"]) - self.cellsize / 2
+            self.ymin = float(header["YLLCENTER"]) - self.cellsize / 2
+        else:
+            self.xmin = float(header["XLLCORNER"])
+            self.ymin = float(header["YLLCORNER"])
+        self.xmax = self.xmin + self.ncols * self.cellsize
+        self.ymax = self.ymin + self.nrows * self.cellsize
+
+        byteorder = header.get("BYTEORDER", "LSBFIRST").upper()
+        self.data = np.memmap(
+            header_path.with_suffix(".flt"),
+            dtype="<f4" if byteorder in ("LSBFIRST", "I") else ">f4",
+            mode="r",
+            shape=(self.nrows, self.ncols),
+        )
+
+    def contains(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return (
+            (x >= self.xmin) & (x <= self.xmax)
+            & (y >= self.ymin) & (y <= self.ymax)
+        )
+
+    def interpolate(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Bilinear interpolation between the centres of the four nearest
+        cells, NaN if any of them has no data
+        """
+
+        # Fractional column and row of the points relative to cell centres,
+        # points within half a cell of the edge use the edge cells
+        col = np.clip((x - self.xmin) / self.cellsize - 0.5, 0, self.ncols - 1)
+        row = np.clip((self.ymax - y) / self.cellsize - 0.5, 0, self.nrows - 1)
+
+        col0 = np.minimum(col.astype(np.intp), max(self.ncols - 2, 0))
+        row0 = np.minimum(row.astype(np.intp), max(self.nrows - 2, 0))
+        col1 = np.minimum(col0 + 1, self.ncols - 1)
+        row1 = np.minimum(row0 + 1, self.nrows - 1)
+        dx = col - col0
+        dy = row - row0
+
+        z00 = self.data[row0, col0].astype(float)
+        z01 = self.data[row0, col1].astype(float)
+        z10 = self.data[row1, col0].astype(float)
+        z11 = self.data[row1, col1].astype(float)
+
+        z = (
+            z00 * (1 - dx) * (1 - dy)
+            + z01 * dx * (1 - dy)
+            + z10 * (1 - dx) * dy
+            + z11 * dx * dy
+        )
+
+        nodata = (
+            (z00 == self.nodata)
+            | (z01 == self.nodata)
+            | (z10 == self.nodata)
+            | (z11 == self.nodata)
+        )
+        z[nodata] = np.nan
+
+        return z
+
+
+class DEMProvider(ElevationProvider):
+    """Elevations interpolated from local DEM tiles, no network needed
+
+    Reads all ESRI float grids (.hdr/.flt pairs) in the directory given by
+    ELEVATION_DEM_PATH, in config.SRID. Lookups are vectorised over all
+    points, so results are not cached in the database.
+    """
+
+    name = "dem"
+    cacheable = False
+
+    def __init__(self, path: str | None = config.ELEVATION_DEM_PATH):
+        if not path:
+            raise ValueError("ELEVATION_DEM_PATH is required for DEM provider")
+
+        self.path = Path(path)
+        self._tiles: list[DEMTile] | None = None
+
+    @property
+    def tiles(self) -> list[DEMTile]:
+        if self._tiles is None:
+            self._tiles = [
+                DEMTile(header_path)
+                for header_path in sorted(self.path.glob("*.hdr"))
+            ]
+        return self._tiles
+
+    def interpolate(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        elevations = np.full(x.shape, np.nan)
+
+        for tile in self.tiles:
+            # Only fill the points not resolved by a previous tile
+            mask = np.isnan(elevations) & tile.contains(x, y)
+            if mask.any():
+                elevations[mask] = tile.interpolate(x[mask], y[mask])
+
+        return elevations
+
+    async def get_elevations(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        # Reading the memory-mapped tiles faults pages in from disk, NumPy
+        # releases the GIL for the interpolation
+        return await run_in_thread(self.interpolate, x, y)
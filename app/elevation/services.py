@@ -0,0 +1,218 @@
+from app.elevation.models import ElevationCache
+from app.elevation.providers import (
+    ElevationProvider,
+    SwisstopoProvider,
+    DEMProvider,
+)
+from app.db import async_session
+from app.crud import MAX_BIND_PARAMETERS
+from app.utils.projection import transform_coordinates
+from app.config import config
+from fastapi import BackgroundTasks, HTTPException
+from numpy.typing import ArrayLike
+from sqlmodel import select
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any
+from uuid import UUID
+import httpx
+import logging
+import numpy as np
+import shapely
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS: dict[str, type[ElevationProvider]] = {
+    "swisstopo": SwisstopoProvider,
+    "dem": DEMProvider,
+}
+
+_provider: ElevationProvider | None = None
+
+
+def get_provider() -> ElevationProvider:
+    """Get the elevation provider selected with ELEVATION_PROVIDER"""
+
+    global _provider
+
+    if _provider is None:
+        if config.ELEVATION_PROVIDER not in PROVIDERS:
+            raise ValueError(
+                f"Unknown elevation provider: {config.ELEVATION_PROVIDER}, "
+                f"use one of {list(PROVIDERS)}"
+            )
+        _provider = PROVIDERS[config.ELEVATION_PROVIDER]()
+
+    return _provider
+
+
+async def close() -> None:
+    global _provider
+
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
+
+
+async def get_elevations(
+    x: ArrayLike,
+    y: ArrayLike,
+    srid: int = config.SRID,
+) -> np.ndarray:
+    """Get the elevation of many points, NaN where none is available
+
+    Points are rounded to ELEVATION_CACHE_DECIMALS in config.SRID and looked
+    up in the cache table in one query, only the points not cached yet are
+    requested from the provider (and then cached). The cache is read and
+    written in its own session so the caller's transaction is not affected.
+    Providers that are not cacheable (local DEMs) are queried directly.
+    """
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if srid != config.SRID:
+        x, y = transform_coordinates(x, y, src=srid, dst=config.SRID)
+
+    provider = get_provider()
+    if not provider.cacheable:
+        return await provider.get_elevations(x, y)
+
+    x = np.round(x, config.ELEVATION_CACHE_DECIMALS)
+    y = np.round(y, config.ELEVATION_CACHE_DECIMALS)
+    points = list(zip(x.tolist(), y.tolist()))
+    elevations = np.full(len(points), np.nan)
+
+    if not points:
+        return elevations
+
+    # Statements are chunked within the PostgreSQL bind parameter limit
+    unique_points = list(set(points))
+    chunk_size = MAX_BIND_PARAMETERS // 2 - 1  # x and y, and the provider
+    cached = {}
+    async with async_session() as session:
+        for start in range(0, len(unique_points), chunk_size):
+            res = await session.exec(
+                select(
+                    ElevationCache.x,
+                    ElevationCache.y,
+                    ElevationCache.elevation,
+                )
+                .where(ElevationCache.provider == provider.name)
+                .where(
+                    tuple_(ElevationCache.x, ElevationCache.y).in_(
+                        unique_points[start : start + chunk_size]
+                    )
+                )
+            )
+            cached.update({(row.x, row.y): row.elevation for row in res.all()})
+
+    missing = {point for point in points if point not in cached}
+    if missing:
+        missing = list(missing)
+        try:
+            resolved = await provider.get_elevations(
+                np.array([point[0] for point in missing]),
+                np.array([point[1] for point in missing]),
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Elevation provider {provider.name} unavailable: {e}",
+            )
+
+        new = [
+            {"provider": provider.name, "x": px, "y": py, "elevation": z}
+            for (px, py), z in zip(missing, resolved.tolist())
+            if not np.isnan(z)
+        ]
+        if new:
+            # Defaults (last_updated) are bound per row too
+            chunk_size = MAX_BIND_PARAMETERS // len(
+                ElevationCache.__table__.columns
+            )
+            async with async_session() as session:
+                for start in range(0, len(new), chunk_size):
+                    await session.exec(
+                        insert(ElevationCache)
+                        .values(new[start : start + chunk_size])
+                        .on_conflict_do_nothing(
+                            constraint="unique_elevation_point"
+                        )
+                    )
+                await session.commit()
+
+        cached.update({(row["x"], row["y"]): row["elevation"] for row in new})
+
+    for i, point in enumerate(points):
+        elevations[i] = cached.get(point, np.nan)
+
+    return elevations
+
+
+async def get_elevation(
+    x: float,
+    y: float,
+    srid: int = config.SRID,
+) -> float:
+    """Get the elevation of a single point"""
+
+    (elevation,) = await get_elevations([x], [y], srid)
+
+    if np.isnan(elevation):
+        raise HTTPException(
+            status_code=400,
+            detail=f"No elevation available at x: {x}, y: {y} (SRID {srid})",
+        )
+
+    return float(elevation)
+
+
+async def set_elevations(model: Any, ids: list[UUID]) -> None:
+    """Set the elevation of the point geometry of the given objects
+
+    Runs as a background task after the response has been sent, so it uses
+    its own session. All objects are resolved in one batch.
+    """
+
+    async with async_session() as session:
+        res = await session.exec(select(model).where(model.id.in_(ids)))
+        objs = [obj for obj in res.all() if obj.geom is not None]
+        if not objs:
+            return
+
+        points = shapely.from_wkb([str(obj.geom) for obj in objs])
+        x, y = shapely.get_x(points), shapely.get_y(points)
+
+        try:
+            elevations = await get_elevations(x, y)
+        except HTTPException as e:
+            logger.warning(
+                "Could not set the elevation of %s: %s", model.__name__, e
+            )
+            return
+
+        for obj, x_, y_, z in zip(objs, x, y, elevations):
+            if not np.isnan(z):
+                obj.geom = shapely.wkt.dumps(shapely.Point(x_, y_, z))
+                session.add(obj)
+
+        await session.commit()
+
+
+def schedule_elevations(
+    background_tasks: BackgroundTasks,
+    model: Any,
+    id: UUID,
+) -> None:
+    """Set the elevation of an object after the response has been sent
+
+    All objects of a model scheduled during the same request are resolved
+    together in a single background task.
+    """
+
+    for task in background_tasks.tasks:
+        if task.func is set_elevations and task.args[0] is model:
+            task.args[1].append(id)
+            return
+
+    background_tasks.add_task(set_elevations, model, [id])
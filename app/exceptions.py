@@ -7,3 +7,22 @@ class ValidationError(HTTPException):
             status_code=400,
             detail=[{"loc": loc, "msg": msg, "type": error_type}],
         )
+
+
+class BatchValidationError(HTTPException):
+    """Errors of several rows of a batch request, reported together
+
+    Each error is a dict with the same keys as ValidationError, with the index
+    of the row in the loc: ["body", index, field].
+    """
+
+    def __init__(self, errors: list[dict]):
+        super().__init__(status_code=400, detail=errors)
+
+
+def batch_error(
+    index: int, loc: list, msg: str, error_type: str = "value_error"
+) -> dict:
+    """An error of the row at index of a batch, for BatchValidationError"""
+
+    return {"loc": ["body", index, *loc], "msg": msg, "type": error_type}
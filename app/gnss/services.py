@@ -13,7 +13,7 @@ from app.utils.funcs import decode_base64
 from app.config import config
 import xml.etree.ElementTree as ET
 import datetime
-import pyproj
+from app.utils.projection import transform_coordinates, WGS84_SRID
 
 router = APIRouter()
 
@@ -78,18 +78,10 @@ def parse_gpx(gpx_data):
         if time:
             time = datetime.datetime.fromisoformat(time).replace(tzinfo=None)
 
-        # Convert lat lon to x and y with the SRID defined in the config
-        transformer = pyproj.Transformer.from_crs(
-            "EPSG:4326", f"EPSG:{str(config.SRID)}", always_xy=True
-        )
-        x, y = transformer.transform(longitude, latitude)
-
         waypoints.append(
             {
                 "latitude": latitude,
                 "longitude": longitude,
-                "x": x,
-                "y": y,
                 "elevation": elevation,
                 "time": time,
                 "name": name,
@@ -99,6 +91,19 @@ def parse_gpx(gpx_data):
             }
         )
 
+    # Convert lat lon to x and y with the SRID defined in the config, for all
+    # waypoints at once
+    if waypoints:
+        xs, ys = transform_coordinates(
+            [waypoint["longitude"] for waypoint in waypoints],
+            [waypoint["latitude"] for waypoint in waypoints],
+            src=WGS84_SRID,
+            dst=config.SRID,
+        )
+        for waypoint, x, y in zip(waypoints, xs, ys):
+            waypoint["x"] = float(x)
+            waypoint["y"] = float(y)
+
     return waypoints
 
 
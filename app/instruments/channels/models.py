@@ -1,6 +1,6 @@
 from sqlmodel import SQLModel, Field, Relationship, UniqueConstraint
 from uuid import UUID, uuid4
-from sqlalchemy import JSON, Column
+from sqlalchemy import JSON, Column, func
 from typing import TYPE_CHECKING, Optional, Any
 import datetime
 
@@ -28,6 +28,15 @@ class InstrumentExperimentChannel(InstrumentExperimentChannelBase, table=True):
         default=None, nullable=False, primary_key=True, index=True
     )
     id: UUID = Field(default_factory=uuid4, index=True, nullable=False)
+    last_updated: datetime.datetime = Field(
+        default_factory=datetime.datetime.now,
+        title="Last Updated",
+        description="Date and time when the record was last updated",
+        sa_column_kwargs={
+            "onupdate": func.now(),
+            "server_default": func.now(),
+        },
+    )
 
     experiment: "InstrumentExperiment" = Relationship(
         back_populates="channels",
@@ -50,3 +59,19 @@ class InstrumentExperimentChannelUpdate(SQLModel):
 
 class InstrumentExperimentChannelCreate(InstrumentExperimentChannelBase):
     pass
+
+
+class InstrumentExperimentChannelPreview(SQLModel):
+    baseline_chosen_points: list | None = Field(
+        default=None,
+        description="Candidate baseline points, the saved baseline is used "
+        "if not given",
+    )
+    integral_chosen_pairs: list = []
+
+
+class InstrumentExperimentChannelPreviewRead(SQLModel):
+    id: UUID
+    time_values: list[float] = []
+    baseline_values: list[float] = []
+    integral_results: list[Any] = []
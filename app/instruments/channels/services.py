@@ -3,6 +3,8 @@ from app.instruments.channels.models import (
     InstrumentExperimentChannelRead,
     InstrumentExperimentChannelCreate,
     InstrumentExperimentChannelUpdate,
+    InstrumentExperimentChannelPreview,
+    InstrumentExperimentChannelPreviewRead,
 )
 from app.db import get_session, AsyncSession
 from fastapi import Depends, APIRouter, Query, Response, HTTPException
@@ -13,9 +15,14 @@ from app.instruments.tools import (
     filter_baseline,
     largest_triangle_three_buckets,
     calculate_integrals_for_pairs,
+    preview_baseline_integrals,
 )
 import numpy as np
 from app.config import config
+from app.compute import run_in_process
+from app.utils.cache import LRUCache, array_digest
+from typing import NamedTuple
+from app.exceptions import ValidationError
 
 router = APIRouter()
 crud = CRUD(
@@ -74,13 +81,15 @@ async def get_one(
 
     # Downsample points, may be necessary, rendering can get slow
     if downsample:
-        res.time_values, res.raw_values = largest_triangle_three_buckets(
+        res.time_values, res.raw_values = await run_in_process(
+            largest_triangle_three_buckets,
             res.time_values,
             res.raw_values,
             config.INSTRUMENT_PLOT_DOWNSAMPLE_THRESHOLD,
         )
 
-        res.time_values, res.baseline_values = largest_triangle_three_buckets(
+        res.time_values, res.baseline_values = await run_in_process(
+            largest_triangle_three_buckets,
             res.time_values,
             res.baseline_values,
             config.INSTRUMENT_PLOT_DOWNSAMPLE_THRESHOLD,
@@ -98,6 +107,7 @@ async def delete_one(
         await session.delete(obj)
 
     await session.commit()
+    invalidate_baselines([id])
 
     return id
 
@@ -113,43 +123,116 @@ async def delete_many(
             await session.delete(obj)
 
     await session.commit()
+    invalidate_baselines(ids)
 
     return ids
 
 
+class BaselineFit(NamedTuple):
+    raw_digest: str  # Digest of the time and raw values the fit is based on
+    spline: np.ndarray
+    filtered: np.ndarray
+
+
+baseline_cache: LRUCache[tuple[UUID, str, str], BaselineFit] = LRUCache(
+    max_entries=config.INSTRUMENT_BASELINE_CACHE_MAX_ENTRIES,
+    max_bytes=config.INSTRUMENT_BASELINE_CACHE_MAX_BYTES,
+    sizeof=lambda fit: fit.spline.nbytes + fit.filtered.nbytes,
+)
+
+
+def invalidate_baselines(channel_ids: list[UUID]) -> None:
+    """Drop the cached baseline fits of the given channels"""
+
+    channel_ids = set(channel_ids)
+    baseline_cache.invalidate(lambda key: key[0] in channel_ids)
+
+
+async def compute_baseline(
+    channel: InstrumentExperimentChannel,
+    baseline_chosen_points: list[dict],
+    interpolation_method: str = "linear",
+) -> BaselineFit:
+    """Fit the baseline of a channel through the chosen points
+
+    Fits are cached by channel, chosen points and interpolation method, so
+    reverting to a set of points that has already been tried does not refit
+    the spline. A cached fit is discarded if the raw data of the channel has
+    changed since it was computed.
+    """
+
+    x = np.asarray(channel.time_values, dtype=float)
+    y = np.asarray(channel.raw_values, dtype=float)
+    points = np.asarray([bp["x"] for bp in baseline_chosen_points], dtype=float)
+
+    key = (channel.id, array_digest(points), interpolation_method)
+    raw_digest = array_digest(x, y)
+
+    fit = baseline_cache.get(key)
+    if fit is not None and fit.raw_digest == raw_digest:
+        return fit
+
+    try:
+        spline = await run_in_process(
+            calculate_spline,
+            x,
+            y,
+            points,
+            interpolation_method=interpolation_method,
+        )
+    except ValueError as e:
+        raise ValidationError(
+            loc=["body", "baseline_chosen_points"], msg=str(e)
+        )
+
+    fit = BaselineFit(raw_digest, spline, filter_baseline(y, spline))
+
+    # Cached arrays are shared between requests, protect them from changes
+    fit.spline.setflags(write=False)
+    fit.filtered.setflags(write=False)
+    baseline_cache.set(key, fit)
+
+    return fit
+
+
 async def update_one(
     id: UUID,
     instrument_experiment_update: InstrumentExperimentChannelUpdate,
+    preview: bool = Query(
+        False,
+        description="Compute the baseline and integrals without saving them",
+    ),
     session: AsyncSession = Depends(get_session),
-) -> InstrumentExperimentChannel:
+) -> InstrumentExperimentChannel | InstrumentExperimentChannelRead:
     # Fetch the instrument experiment by ID
     channel = await crud.get_model_by_id(model_id=id, session=session)
 
+    if not channel:
+        raise HTTPException(status_code=404, detail=f"ID: {id} not found")
+
     update_data = instrument_experiment_update.model_dump(exclude_unset=True)
 
+    # Integrals are calculated on the new baseline if it is also updated
+    baseline_values = np.asarray(channel.baseline_values, dtype=float)
+
     if "baseline_chosen_points" in update_data:
         baseline_chosen_points = update_data["baseline_chosen_points"]
 
-        x = np.array(channel.time_values)
-        y = np.array(channel.raw_values)
-
         # If there are no points, remove the baseline
         if not baseline_chosen_points:
             update_data["baseline_spline"] = []
             update_data["baseline_values"] = []
+            baseline_values = np.array([])
         else:
             # Calculate the spline and filtered baseline
-            spline = calculate_spline(
-                x,
-                y,
-                [bp["x"] for bp in baseline_chosen_points],
-                interpolation_method="linear",
+            fit = await compute_baseline(
+                channel, baseline_chosen_points, interpolation_method="linear"
             )
-            filtered_baseline = filter_baseline(y, spline)
+            baseline_values = fit.filtered
 
             # Update the instrument experiment data
-            update_data["baseline_spline"] = spline.tolist()
-            update_data["baseline_values"] = filtered_baseline.tolist()
+            update_data["baseline_spline"] = fit.spline.tolist()
+            update_data["baseline_values"] = fit.filtered.tolist()
 
     if "integral_chosen_pairs" in update_data:
         """
@@ -157,19 +240,29 @@ async def update_one(
         to integral_results
         """
 
-        # Assuming baseline_values and time_values are numpy arrays
-        baseline_values = np.array(channel.baseline_values)
-        time_values = np.array(channel.time_values)
+        time_values = np.asarray(channel.time_values, dtype=float)
 
-        integral_results = calculate_integrals_for_pairs(
-            update_data["integral_chosen_pairs"],
-            baseline_values,
-            time_values,
-            integration_method="simpson",
-        )
+        try:
+            integral_results = await run_in_process(
+                calculate_integrals_for_pairs,
+                update_data["integral_chosen_pairs"],
+                baseline_values,
+                time_values,
+                integration_method="simpson",
+            )
+        except ValueError as e:
+            raise ValidationError(
+                loc=["body", "integral_chosen_pairs"], msg=str(e)
+            )
 
         update_data["integral_results"] = integral_results
 
+    if preview:
+        # Return the result without writing anything to the database
+        return InstrumentExperimentChannelRead.model_validate(
+            channel
+        ).model_copy(update=update_data)
+
     # Update the instrument experiment model with the new data
     channel.sqlmodel_update(update_data)
     session.add(channel)
@@ -178,3 +271,61 @@ async def update_one(
     await session.refresh(channel)
 
     return channel
+
+
+async def preview_one(
+    id: UUID,
+    preview: InstrumentExperimentChannelPreview,
+    threshold: int = Query(
+        config.INSTRUMENT_PLOT_DOWNSAMPLE_THRESHOLD,
+        ge=3,
+        description="Number of points to downsample the baseline to",
+    ),
+    session: AsyncSession = Depends(get_session),
+) -> InstrumentExperimentChannelPreviewRead:
+    """Compute the integrals and downsampled baseline for candidate points
+
+    Nothing is written to the database, the baseline fit is cached so that
+    saving the same points afterwards does not refit the spline.
+    """
+
+    channel = await crud.get_model_by_id(model_id=id, session=session)
+
+    if not channel:
+        raise HTTPException(status_code=404, detail=f"ID: {id} not found")
+
+    if preview.baseline_chosen_points is None:
+        baseline_values = np.asarray(channel.baseline_values, dtype=float)
+    elif preview.baseline_chosen_points:
+        fit = await compute_baseline(channel, preview.baseline_chosen_points)
+        baseline_values = fit.filtered
+    else:
+        baseline_values = np.array([])
+
+    if len(baseline_values) == 0:
+        if preview.integral_chosen_pairs:
+            raise ValidationError(
+                loc=["body", "integral_chosen_pairs"],
+                msg="A baseline is required to calculate integrals",
+            )
+        return InstrumentExperimentChannelPreviewRead(id=channel.id)
+
+    try:
+        time_values, baseline_values, integral_results = await run_in_process(
+            preview_baseline_integrals,
+            np.asarray(channel.time_values, dtype=float),
+            baseline_values,
+            preview.integral_chosen_pairs,
+            threshold,
+        )
+    except ValueError as e:
+        raise ValidationError(
+            loc=["body", "integral_chosen_pairs"], msg=str(e)
+        )
+
+    return InstrumentExperimentChannelPreviewRead(
+        id=channel.id,
+        time_values=time_values.tolist(),
+        baseline_values=baseline_values.tolist(),
+        integral_results=integral_results,
+    )
@@ -5,22 +5,40 @@ from app.instruments.channels.services import (
     get_data,
     get_one,
     update_one,
+    preview_one,
+    crud,
 )
 from app.instruments.channels.models import (
     InstrumentExperimentChannel,
     InstrumentExperimentChannelRead,
+    InstrumentExperimentChannelPreviewRead,
+)
+from app.instruments.models.experiment import InstrumentExperiment
+from app.utils.responses import (
+    CachedRoute,
+    FastJSONResponse,
+    model_response,
 )
 
-router = APIRouter()
+router = APIRouter(
+    route_class=CachedRoute, default_response_class=FastJSONResponse
+)
 
 
-@router.get("/{id}", response_model=InstrumentExperimentChannelRead)
+@router.get(
+    "/{id}",
+    response_model=InstrumentExperimentChannelRead,
+    dependencies=[
+        Depends(crud.detail_etag(related=[InstrumentExperiment]))
+    ],
+)
 async def get_instrument_experiment_channel(
+    response: Response,
     obj: InstrumentExperimentChannel = Depends(get_one),
 ) -> InstrumentExperimentChannelRead:
     """Get an experiment channel by id"""
 
-    return obj
+    return model_response(obj, InstrumentExperimentChannelRead, response)
 
 
 @router.get("", response_model=list[InstrumentExperimentChannelRead])
@@ -41,3 +59,17 @@ async def update_instrument_experiment_channel(
     """Update a instrument_experiment_channel by id"""
 
     return obj
+
+
+@router.post(
+    "/{id}/preview", response_model=InstrumentExperimentChannelPreviewRead
+)
+async def preview_instrument_experiment_channel(
+    obj: InstrumentExperimentChannelPreviewRead = Depends(preview_one),
+) -> InstrumentExperimentChannelPreviewRead:
+    """Preview the baseline and integrals of a channel without saving them
+
+    The baseline corrected series is downsampled to `threshold` points
+    """
+
+    return model_response(obj, InstrumentExperimentChannelPreviewRead)
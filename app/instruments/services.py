@@ -6,6 +6,7 @@ from app.instruments.models.experiment import (
     InstrumentExperimentUpdate,
 )
 from app.instruments.channels.models import InstrumentExperimentChannel
+from app.instruments.channels.services import invalidate_baselines
 from app.db import get_session, AsyncSession
 from fastapi import Depends, APIRouter, Query, Response, HTTPException
 from uuid import UUID
@@ -185,10 +186,13 @@ async def delete_one(
 ) -> UUID:
 
     obj = await crud.get_model_by_id(model_id=id, session=session)
+    channel_ids = []
     if obj:
+        channel_ids = [channel.id for channel in obj.channels]
         await session.delete(obj)
 
     await session.commit()
+    invalidate_baselines(channel_ids)
 
     return id
 
@@ -198,12 +202,15 @@ async def delete_many(
     session: AsyncSession = Depends(get_session),
 ) -> list[UUID]:
 
+    channel_ids = []
     for id in ids:
         obj = await crud.get_model_by_id(model_id=id, session=session)
         if obj:
+            channel_ids += [channel.id for channel in obj.channels]
             await session.delete(obj)
 
     await session.commit()
+    invalidate_baselines(channel_ids)
 
     return ids
 
@@ -1,6 +1,8 @@
 import numpy as np
+from numpy.typing import ArrayLike
 from typing import List, Dict
 import pybaselines
+import lttb
 from scipy.constants import physical_constants
 from scipy.integrate import simpson
 
@@ -73,6 +75,92 @@ def largest_triangle_three_buckets(x, y, threshold):
     return downsampled_x, downsampled_y
 
 
+def find_time_indices(
+    time_values: np.ndarray,
+    targets: ArrayLike,
+    tolerance: float | None = None,
+) -> np.ndarray:
+    """Find the index of each target on a monotonic time axis
+
+    Uses a binary search (`np.searchsorted`) and snaps each target to the
+    nearest time value, so values that are not an exact float match of the
+    axis (ie. picked by the user in the UI) are still found.
+
+    Parameters
+    ----------
+    time_values : np.ndarray
+        The monotonically increasing time axis
+    targets : ArrayLike
+        The time values to find the indices of
+    tolerance : float, optional
+        The maximum distance between a target and the time value it is
+        snapped to, by default half of the average sample interval
+
+    Returns
+    -------
+    np.ndarray
+        The index into `time_values` of each target
+
+    Raises
+    ------
+    ValueError
+        If a target is further than the tolerance from any time value
+    """
+
+    time_values = np.asarray(time_values, dtype=float)
+    targets = np.atleast_1d(np.asarray(targets, dtype=float))
+
+    if len(targets) == 0:
+        return np.array([], dtype=int)
+    if len(time_values) < 2:
+        raise ValueError("At least two time values are required")
+
+    if tolerance is None:
+        tolerance = (time_values[-1] - time_values[0]) / (
+            2 * (len(time_values) - 1)
+        )
+
+    # The insertion point is the right neighbour, so compare it against the
+    # left neighbour and take whichever is closest
+    right = np.clip(
+        np.searchsorted(time_values, targets), 1, len(time_values) - 1
+    )
+    left = right - 1
+    indices = np.where(
+        np.abs(targets - time_values[left])
+        <= np.abs(time_values[right] - targets),
+        left,
+        right,
+    )
+
+    not_found = np.abs(time_values[indices] - targets) > tolerance
+    if np.any(not_found):
+        raise ValueError(
+            f"Time values {targets[not_found].tolist()} are not on the time "
+            "axis of the data"
+        )
+
+    return indices
+
+
+def downsample_series(
+    x: np.ndarray, y: np.ndarray, threshold: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Downsample a series to the threshold number of points with LTTB
+
+    Uses the NumPy implementation of the Largest Triangle Three Buckets
+    algorithm from the `lttb` package. Series that are already small enough
+    are returned as they are.
+    """
+
+    if len(x) <= max(threshold, 2):
+        return x, y
+
+    downsampled = lttb.downsample(np.column_stack((x, y)), max(threshold, 3))
+
+    return downsampled[:, 0], downsampled[:, 1]
+
+
 def calculate_spline(
     x: np.ndarray,
     y: np.ndarray,
@@ -80,9 +168,8 @@ def calculate_spline(
     interpolation_method: str,
 ) -> np.ndarray:
     fitter = pybaselines.Baseline(x, check_finite=False)
-    pairs = np.array(
-        [(bp, y[np.where(x == bp)][0]) for bp in baseline_selected_points]
-    )
+    indices = find_time_indices(x, baseline_selected_points)
+    pairs = np.column_stack((x[indices], y[indices]))
 
     if len(baseline_selected_points) < 4:
         spline = fitter.interp_pts(
@@ -195,14 +282,20 @@ def calculate_integrals_for_pairs(
     """
     integration_results = []
 
-    for pair in pairs:
+    # Get indices for the start and end points of all pairs at once
+    start_indices = find_time_indices(
+        time_values, [pair["start"]["x"] for pair in pairs]
+    )
+    end_indices = find_time_indices(
+        time_values, [pair["end"]["x"] for pair in pairs]
+    )
+
+    for pair, start_index, end_index in zip(
+        pairs, start_indices, end_indices
+    ):
         start = pair["start"]["x"]
         end = pair["end"]["x"]
 
-        # Get indices for the start and end points
-        start_index = np.where(time_values == start)[0][0]
-        end_index = np.where(time_values == end)[0][0]
-
         # Get X and Y values between start and end
         x_values = time_values[start_index : end_index + 1]
         y_values = baseline_values[start_index : end_index + 1]
@@ -225,3 +318,29 @@ def calculate_integrals_for_pairs(
     integration_results = sorted(integration_results, key=lambda x: x["start"])
 
     return integration_results
+
+
+def preview_baseline_integrals(
+    time_values: np.ndarray,
+    baseline_values: np.ndarray,
+    pairs: List[Dict[str, Dict[str, float]]],
+    threshold: int,
+    integration_method: str = "simpson",
+) -> tuple[np.ndarray, np.ndarray, List[Dict[str, float]]]:
+    """Calculate the integrals of the pairs and downsample the baseline
+
+    Combines both steps so a preview only needs to be dispatched once to the
+    compute executor.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, List[Dict[str, float]]]
+        The downsampled time and baseline values, and the integral results
+    """
+
+    integral_results = calculate_integrals_for_pairs(
+        pairs, baseline_values, time_values, integration_method
+    )
+    x, y = downsample_series(time_values, baseline_values, threshold)
+
+    return x, y, integral_results
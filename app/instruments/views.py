@@ -8,7 +8,6 @@ from app.db import get_session, AsyncSession
 from fastapi import Depends, APIRouter, Query, Response, HTTPException
 from sqlmodel import select
 from uuid import UUID
-from typing import Any
 from app.crud import CRUD
 from app.plots.models import Plot
 from app.instruments.services import (
@@ -19,25 +18,61 @@ from app.instruments.services import (
     delete_one,
     delete_many,
     update_one,
+    crud,
 )
-import csv
+from app.instruments.channels.models import InstrumentExperimentChannel
+from app.projects.models import Project
+from app.instruments.tools import find_time_indices
+from app.exceptions import ValidationError
+from app.utils.exports import (
+    csv_response,
+    iter_csv_columns,
+    iter_csv_rows,
+)
+from app.utils.responses import (
+    CachedRoute,
+    FastJSONResponse,
+    model_response,
+)
+from fastapi.responses import StreamingResponse
+import numpy as np
 
-router = APIRouter()
+router = APIRouter(
+    route_class=CachedRoute, default_response_class=FastJSONResponse
+)
 
 
-@router.get("/{id}", response_model=InstrumentExperimentRead)
+@router.get(
+    "/{id}",
+    response_model=InstrumentExperimentRead,
+    dependencies=[
+        Depends(
+            crud.detail_etag(
+                related=[Project],
+                children=[InstrumentExperimentChannel.experiment_id],
+            )
+        )
+    ],
+)
 async def get_instrument_experiment(
+    response: Response,
     obj: InstrumentExperiment = Depends(get_one),
 ) -> InstrumentExperimentRead:
     """Get an experiment by id"""
 
-    return obj
+    return model_response(obj, InstrumentExperimentRead, response)
 
 
-@router.get("/{id}/raw")
+def export_filename(obj: InstrumentExperiment, suffix: str) -> str:
+    """Name the exported file after the experiment"""
+
+    return f"{obj.name or obj.id}_{suffix}.csv"
+
+
+@router.get("/{id}/raw", response_class=StreamingResponse)
 async def get_instrument_experiment_rawdata(
     obj: InstrumentExperiment = Depends(get_one),
-) -> Any:
+) -> StreamingResponse:
     """Get an experiment's raw data by id, and all of its channels as CSV
 
     The time column is equivalent for each channel, the channel header is
@@ -49,21 +84,24 @@ async def get_instrument_experiment_rawdata(
     channels = sorted(obj.channels, key=lambda x: x.channel_name)
     header += [f"{channel.channel_name}" for channel in channels]
 
-    # Form CSV by looping through each column and its data using the structure
-    # defined in the docstring
-    csv_data = [header]
-    for i in range(len(obj.channels[0].raw_values)):
-        row = [obj.channels[0].time_values[i]]
-        row += [channel.raw_values[i] for channel in channels]
-        csv_data.append(row)
-
-    return csv_data
+    # Each channel becomes a column using the structure defined in the
+    # docstring, rows are formatted block by block while streaming
+    columns = []
+    if channels:
+        columns.append(np.asarray(channels[0].time_values, dtype=float))
+    columns += [
+        np.asarray(channel.raw_values, dtype=float) for channel in channels
+    ]
+
+    return csv_response(
+        iter_csv_columns(header, columns), export_filename(obj, "raw")
+    )
 
 
-@router.get("/{id}/filtered")
+@router.get("/{id}/filtered", response_class=StreamingResponse)
 async def get_instrument_experiment_baseline_filtered_data(
     obj: InstrumentExperiment = Depends(get_one),
-) -> Any:
+) -> StreamingResponse:
     """Get an experiment's baseline filtered data as CSV for each sample
 
     The time start values have been reduced to 0 and no longer represent the
@@ -76,93 +114,77 @@ async def get_instrument_experiment_baseline_filtered_data(
     # defined by the start and end values
     samples = []
     for channel in obj.channels:
+        # Get baseline data, the data matches the time values, but they are
+        # incremented in steps, not incremental indices, so we will need
+        # to find the index of the start and end values in the time_values
+        # to get the corresponding baseline_values index
+        time_values = np.asarray(channel.time_values, dtype=float)
+        baseline_values = np.asarray(channel.baseline_values, dtype=float)
+
         for result in channel.integral_results:
-            result["channel_name"] = channel.channel_name
-            result["column"] = (
-                (
-                    f"{channel.channel_name}_"
-                    f"{result.get('sample_name', f'undefined')}"
+            sample_name = result.get("sample_name", "undefined")
+            try:
+                start_index, end_index = find_time_indices(
+                    time_values, [result["start"], result["end"]]
+                )
+            except ValueError as e:
+                raise ValidationError(
+                    loc=["integral_results"],
+                    msg=(
+                        f"Channel {channel.channel_name}, "
+                        f"sample {sample_name}: {e}"
+                    ),
                 )
-                .lower()
-                .replace(" ", "_")
-            )
-            # Get baseline data, the data matches the time values, but they are
-            # incremented in steps, not incremental indices, so we will need
-            # to find the index of the start and end values in the time_values
-            # to get the corresponding baseline_values index
-            start_index = channel.time_values.index(result["start"])
-            end_index = channel.time_values.index(result["end"])
-            result["baseline_values"] = channel.baseline_values[
-                start_index:end_index
-            ]
 
-            samples.append(result)
+            column = f"{channel.channel_name}_{sample_name}"
+            column = column.lower().replace(" ", "_")
+            samples.append(
+                (column, baseline_values[start_index:end_index])
+            )
 
     # Check all column names are unique if not, just add the enumerator
-    for i, result in enumerate(samples):
-        for j, result2 in enumerate(samples):
-            if i != j and result["column"] == result2["column"]:
-                samples[i]["column"] = f"{result['column']}_{i}"
-
-    samples = sorted(samples, key=lambda x: x["column"])
-
-    # Adjust time for each sample such that the start is at 0
-    for result in samples:
-        result["adjusted_end"] = result["end"] - result["start"]
-        result["adjusted_start"] = 0
+    columns = [column for column, _ in samples]
+    for i in range(len(columns)):
+        for j in range(len(columns)):
+            if i != j and columns[i] == columns[j]:
+                columns[i] = f"{columns[i]}_{i}"
+
+    samples = sorted(
+        zip(columns, [values for _, values in samples]), key=lambda x: x[0]
+    )
 
     # Form CSV header with time and defined column name from above
     header = ["time/s"]
-    header += [f"{result['column']}" for result in samples]
+    header += [column for column, _ in samples]
 
-    # Initialize csv_data with header
-    csv_data = [header]
+    # The time starts at 0 for each sample and increments by the time step of
+    # the first channel, until the longest sample runs out of data. Shorter
+    # samples are left empty once they run out of data.
+    time_values = obj.channels[0].time_values if obj.channels else []
+    time_step = time_values[1] - time_values[0] if len(time_values) > 1 else 0
+    n_rows = max((len(values) for _, values in samples), default=0)
 
-    time_step = int(  # Get the time step from the first channel
-        obj.channels[0].time_values[1] - obj.channels[0].time_values[0]
-    )
-
-    # Find the maximum time value of the longest sample in duration
-    max_time = max(result["end"] for result in samples)
-
-    # Loop through each time value and fill the row with the corresponding
-    # baseline filterd value, starting the time at 0 and incrementing by the
-    # time step. The max time is the max time value of the longest
-    # sample in duration
-    for i, time in enumerate(range(0, max_time, time_step)):
-        row = [time]
-        empty_data = 0
-        for result in samples:
-            # We just need to add the data sequentially for all the samples
-            # the time doesn't matter, so we just can use the index. But we
-            # will need to be sure that the index exists otherwise we will
-            # get an index error
-            try:
-                row.append(result["baseline_values"][i])
-            except IndexError:
-                empty_data += 1
-                row.append(None)
-
-        # Stop when there is no data left
-        if empty_data == len(samples):
-            break
+    columns = [np.arange(n_rows) * time_step]
+    columns += [values for _, values in samples]
 
-        csv_data.append(row)
-
-    return csv_data
+    return csv_response(
+        iter_csv_columns(header, columns), export_filename(obj, "filtered")
+    )
 
 
-@router.get("/{id}/summary")
+@router.get("/{id}/summary", response_class=StreamingResponse)
 async def get_instrument_experiment_summary_data(
     obj: InstrumentExperiment = Depends(get_one),
-) -> Any:
+) -> StreamingResponse:
     """Create a CSV return that returns the channel integral data"""
 
     header = ["measurement"]
     channels = sorted(obj.channels, key=lambda x: x.channel_name)
 
     # Find the maximum number of samples
-    max_samples = max(len(channel.integral_results) for channel in channels)
+    max_samples = max(
+        (len(channel.integral_results) for channel in channels), default=0
+    )
 
     # Construct the header
     for i in range(1, max_samples + 1):
@@ -174,7 +196,7 @@ async def get_instrument_experiment_summary_data(
         ]
 
     # Create CSV rows
-    csv_data = [header]
+    rows = [header]
     for channel in channels:
         row = [channel.channel_name]
         for sample in channel.integral_results:
@@ -186,12 +208,10 @@ async def get_instrument_experiment_summary_data(
             ]
         # Fill remaining values with 'nan' if the channel has fewer samples
         remaining_samples = max_samples - len(channel.integral_results)
-        row += ["nan"] * (
-            remaining_samples * 3
-        )  # Adjust multiplier if peak_time and peak_value are included
-        csv_data.append(row)
+        row += ["nan"] * (remaining_samples * 4)
+        rows.append(row)
 
-    return csv_data
+    return csv_response(iter_csv_rows(rows), export_filename(obj, "summary"))
 
 
 @router.get("", response_model=list[InstrumentExperimentRead])
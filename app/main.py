@@ -1,7 +1,11 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from app.config import config
+from app.utils.compression import CompressionMiddleware
+from app import compute
+from app.elevation import services as elevation
 
 from app.areas.views import router as areas_router
 from app.sensors.views import router as sensors_router
@@ -15,9 +19,18 @@ from app.utils.views import router as utils_router
 from app.gnss.views import router as gnss_router
 from app.instruments.views import router as instruments_router
 from app.instruments.channels.views import router as instrument_channels_router
+from app.tiles.views import router as tiles_router
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release the compute executor workers and HTTP clients on shutdown
+    compute.shutdown()
+    await elevation.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 origins = ["*"]
@@ -30,6 +43,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
 
 
 class HealthCheck(BaseModel):
@@ -115,3 +129,8 @@ app.include_router(
     prefix=f"{config.API_V1_PREFIX}/instrument_channels",
     tags=["instruments", "channels"],
 )
+app.include_router(
+    tiles_router,
+    prefix=f"{config.API_V1_PREFIX}/tiles",
+    tags=["tiles"],
+)
@@ -19,7 +19,6 @@ import enum
 from app.utils.validators import (
     convert_wkb_to_x_y,
     convert_x_y_to_wkt,
-    resize_image,
     empty_string_to_none,
 )
 
@@ -175,6 +174,11 @@ class SensorDistance(SQLModel):
     elevation_difference: float
 
 
+class PlotNearestSensors(SQLModel):
+    plot_id: UUID
+    sensors: list[SensorDistance] = []
+
+
 class PlotReadWithSamples(PlotReadWithArea):
     samples: list[Any] = []
     area: Any
@@ -196,7 +200,6 @@ class PlotCreate(PlotBase):
 
     # Validators
     _convert_x_y_to_wkt = model_validator(mode="after")(convert_x_y_to_wkt)
-    _resize_image = model_validator(mode="after")(resize_image)
     _handle_empty_string = model_validator(mode="before")(empty_string_to_none)
 
 
@@ -214,7 +217,6 @@ class PlotUpdate(PlotBase):
 
     # Validators
     _convert_x_y_to_wkt = model_validator(mode="after")(convert_x_y_to_wkt)
-    _resize_image = model_validator(mode="after")(resize_image)
     _handle_empty_string = model_validator(mode="before")(empty_string_to_none)
 
 
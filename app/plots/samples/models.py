@@ -303,3 +303,40 @@ class PlotSampleUpdate(PlotSampleBase):
 
 class PlotSampleUpdateBatch(PlotSampleUpdate):
     id: UUID
+
+
+class MeasureSummary(SQLModel):
+    count: int
+    mean: float | None = None
+    std: float | None = None
+    min: float | None = None
+    max: float | None = None
+    percentiles: dict[str, float | None] = {}  # By percentile, ie. "0.5"
+
+
+class PlotSampleAggregate(SQLModel):
+    # Only the fields of the requested groups are set
+    project_id: UUID | None = None
+    project_name: str | None = None
+    area_id: UUID | None = None
+    area_name: str | None = None
+    plot_id: UUID | None = None
+    plot_name: str | None = None
+    gradient: str | None = None
+    depth_from_cm: float | None = None
+    depth_to_cm: float | None = None
+
+    measures: dict[str, MeasureSummary] = {}
+
+
+class PlotDepthProfile(SQLModel):
+    plot_id: UUID
+    # By property then depth, None where no sample covers the depth
+    values: list[list[float | None]] = []
+
+
+class DepthProfiles(SQLModel):
+    properties: list[str]
+    depth_from_cm: list[float]  # Upper depth of each step of the grid
+    depth_step_cm: float
+    plots: list[PlotDepthProfile] = []
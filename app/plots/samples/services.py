@@ -3,6 +3,11 @@ from app.plots.samples.models import (
     PlotSample,
     PlotSampleCreate,
     PlotSampleUpdate,
+    PlotSampleUpdateBatch,
+    PlotSampleAggregate,
+    MeasureSummary,
+    DepthProfiles,
+    PlotDepthProfile,
 )
 from app.plots.models import Plot
 from app.areas.models import Area
@@ -10,14 +15,28 @@ from app.projects.models import Project
 from app.db import get_session, AsyncSession
 from fastapi import Depends, APIRouter, Query, Response, HTTPException
 from uuid import UUID
-from app.crud import CRUD
+from app.crud import CRUD, MAX_BIND_PARAMETERS
+from app.references.services import project_cache, area_cache
 from sqlmodel import select
 from sqlalchemy import func
-from app.exceptions import ValidationError
+from app.exceptions import (
+    ValidationError,
+    BatchValidationError,
+    batch_error,
+)
 from sqlalchemy.exc import NoResultFound
 import sqlalchemy
 from sqlalchemy.sql import cast
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, NamedTuple
+from app.config import config
+from app.utils.cache import LRUCache
+from app.compute import run_in_process
+import math
+import numpy as np
+import pydantic
 
 router = APIRouter()
 crud = CRUD(
@@ -27,6 +46,11 @@ crud = CRUD(
 TABLES_TO_JOIN = [Plot, Area, Project]
 FIELDS_TO_QUERY = [Plot.name, Area.name, Project.name]
 
+CONFLICT_DETAIL = (
+    "Either a sample name is not unique, or a sample with the same "
+    "replicate, upper and lower depth already exists."
+)
+
 
 async def get_count(
     response: Response,
@@ -79,6 +103,25 @@ async def get_one(
     return res
 
 
+async def get_area_id(
+    session: AsyncSession,
+    project_name: str,
+    area_name: str,
+) -> UUID | None:
+    """ID of an area by its name and its project's name, case insensitively
+
+    Looked up in the reference caches, without querying the tables.
+    """
+
+    projects = await project_cache.find(session, project_name)
+    project_ids = {project.id for project in projects}
+    for area in await area_cache.find(session, area_name):
+        if area.project_id in project_ids:
+            return area.id
+
+    return None
+
+
 async def create_one(
     data: dict,
     session: AsyncSession,
@@ -114,8 +157,12 @@ async def create_one(
 
             query = await session.exec(
                 select(Plot)
-                .join(Area)
-                .join(Project)
+                .where(
+                    Plot.area_id
+                    == await get_area_id(
+                        session, data["project_name"], data["area_name"]
+                    )
+                )
                 .where(
                     Plot.plot_iterator == int(data["plot_iterator"]),
                 )
@@ -124,12 +171,6 @@ async def create_one(
                     func.lower(cast(Plot.gradient, sqlalchemy.String))
                     == data["plot_gradient"].lower()
                 )
-                .where(
-                    func.lower(Area.name) == data["area_name"].lower(),
-                )
-                .where(
-                    func.lower(Project.name) == data["project_name"].lower()
-                )
             )
 
             plot = query.one()
@@ -206,8 +247,14 @@ async def update_one(
         try:
             query = await session.exec(
                 select(Plot)
-                .join(Area)
-                .join(Project)
+                .where(
+                    Plot.area_id
+                    == await get_area_id(
+                        session,
+                        update_data["project_name"],
+                        update_data["area_name"],
+                    )
+                )
                 .where(
                     Plot.plot_iterator == int(update_data["plot_iterator"]),
                 )
@@ -216,13 +263,6 @@ async def update_one(
                     func.lower(cast(Plot.gradient, sqlalchemy.String))
                     == update_data["plot_gradient"].lower()
                 )
-                .where(
-                    func.lower(Area.name) == update_data["area_name"].lower(),
-                )
-                .where(
-                    func.lower(Project.name)
-                    == update_data["project_name"].lower()
-                )
             )
             plot = query.one()
             update_data["plot_id"] = plot.id
@@ -252,3 +292,643 @@ async def update_one(
     await session.refresh(obj)
 
     return obj
+
+
+async def resolve_plot_ids(
+    session: AsyncSession,
+    rows: list[dict],
+) -> list[dict]:
+    """Set the plot ID of many sample rows, returning the errors of each row
+
+    Rows without a plot ID are matched on their (project name, area name,
+    plot gradient, plot iterator) key, case insensitively. Areas are found
+    in the reference caches, then all distinct keys and given plot IDs are
+    resolved together in one query.
+    """
+
+    errors = []
+    keys = {}
+    for i, row in enumerate(rows):
+        if row.get("plot_id"):
+            continue
+        if (
+            not row.get("project_name")
+            or not row.get("area_name")
+            or not row.get("plot_gradient")
+            or not row.get("plot_iterator")
+        ):
+            errors.append(
+                batch_error(
+                    i,
+                    [],
+                    "Project name, area name, plot gradient and plot "
+                    "iterator are required fields if Plot ID not given",
+                    "value_error",
+                )
+            )
+            continue
+        keys[i] = (
+            await get_area_id(session, row["project_name"], row["area_name"]),
+            row["plot_gradient"].lower(),
+            int(row["plot_iterator"]),
+        )
+
+    plot_ids = {row["plot_id"] for row in rows if row.get("plot_id")}
+    key_columns = (
+        Plot.area_id,
+        # Cast to string because it's an enum
+        func.lower(cast(Plot.gradient, sqlalchemy.String)),
+        Plot.plot_iterator,
+    )
+    res = await session.exec(
+        select(Plot.id, *key_columns).where(
+            Plot.id.in_(plot_ids)
+            | sqlalchemy.tuple_(*key_columns).in_(
+                {key for key in keys.values() if key[0] is not None}
+            )
+        )
+    )
+    found = res.all()
+    plots_by_key = {tuple(row[1:]): row[0] for row in found}
+    existing_ids = {row[0] for row in found}
+
+    for i, row in enumerate(rows):
+        if i in keys:
+            if keys[i] in plots_by_key:
+                row["plot_id"] = plots_by_key[keys[i]]
+            else:
+                errors.append(
+                    batch_error(
+                        i,
+                        [],
+                        "Plot with the given project name "
+                        f"({row['project_name']}), "
+                        f"area name ({row['area_name']}), "
+                        f"plot gradient ({row['plot_gradient']}), "
+                        f"and plot iterator ({row['plot_iterator']}) "
+                        "not found",
+                        "value_error",
+                    )
+                )
+        elif row.get("plot_id") and row["plot_id"] not in existing_ids:
+            errors.append(
+                batch_error(
+                    i,
+                    ["plot_id"],
+                    f"Plot ID: {row['plot_id']} not found",
+                    "value_error",
+                )
+            )
+
+    return errors
+
+
+def depth_key(sample: Any) -> tuple:
+    """The unique_plot_sample_depth key of a sample row or object"""
+
+    if isinstance(sample, dict):
+        return (
+            sample["plot_id"],
+            sample["replicate"],
+            sample["upper_depth_cm"],
+            sample["lower_depth_cm"],
+        )
+
+    return (
+        sample.plot_id,
+        sample.replicate,
+        sample.upper_depth_cm,
+        sample.lower_depth_cm,
+    )
+
+
+async def upsert_many(
+    samples: list[PlotSampleCreate],
+    session: AsyncSession,
+) -> list[PlotSample]:
+    """Create or update many plot samples in one transaction
+
+    Plots are resolved for all rows in one query. Samples are upserted on
+    the unique_plot_sample_depth constraint: a sample with the same plot,
+    replicate and depths is updated instead of failing. Rows that would
+    still conflict (the same depth twice in the batch, or a sample name
+    already used by another sample of the plot) are reported per row
+    before anything is written, instead of failing on an IntegrityError.
+    """
+
+    if not samples:
+        return []
+
+    rows = [sample.model_dump() for sample in samples]
+
+    errors = await resolve_plot_ids(session, rows)
+    if errors:
+        raise BatchValidationError(errors)
+
+    res = await session.exec(
+        select(
+            PlotSample.plot_id,
+            PlotSample.replicate,
+            PlotSample.upper_depth_cm,
+            PlotSample.lower_depth_cm,
+            PlotSample.name,
+        ).where(PlotSample.plot_id.in_({row["plot_id"] for row in rows}))
+    )
+    existing = res.all()
+    # Sample names of the plots by (plot, name), to the depth key owning it
+    names = {
+        (row.plot_id, row.name): depth_key(row)
+        for row in existing
+        if row.name is not None
+    }
+
+    seen = {}
+    for i, row in enumerate(rows):
+        key = depth_key(row)
+        if key in seen:
+            errors.append(
+                batch_error(
+                    i,
+                    [],
+                    f"Same plot, replicate and depths as row {seen[key]}",
+                    "unique_violation",
+                )
+            )
+            continue
+        seen[key] = i
+
+        if row.get("name") is not None:
+            owner = names.get((row["plot_id"], row["name"]))
+            if owner is not None and owner != key:
+                errors.append(
+                    batch_error(
+                        i,
+                        ["name"],
+                        f"Sample name: {row['name']} already exists in the "
+                        "plot with another replicate or depth",
+                        "unique_violation",
+                    )
+                )
+                continue
+            names[(row["plot_id"], row["name"])] = key
+
+    if errors:
+        raise BatchValidationError(errors)
+
+    columns = [
+        column.name
+        for column in PlotSample.__table__.columns
+        if column.name != "iterator"
+    ]
+    values = []
+    for i, row in enumerate(rows):
+        try:
+            obj = PlotSample.model_validate(row)
+        except pydantic.ValidationError as e:
+            errors.extend(
+                batch_error(i, list(error["loc"]), error["msg"], error["type"])
+                for error in e.errors()
+            )
+            continue
+        values.append({column: getattr(obj, column) for column in columns})
+
+    if errors:
+        raise BatchValidationError(errors)
+
+    stmt = insert(PlotSample)
+    stmt = stmt.on_conflict_do_update(
+        constraint="unique_plot_sample_depth",
+        set_={
+            **{
+                column: stmt.excluded[column]
+                for column in columns
+                if column not in ("id", "last_updated")
+            },
+            "last_updated": func.now(),
+        },
+    ).returning(
+        PlotSample.id,
+        PlotSample.plot_id,
+        PlotSample.replicate,
+        PlotSample.upper_depth_cm,
+        PlotSample.lower_depth_cm,
+    )
+
+    # One statement per chunk, within the PostgreSQL bind parameter limit
+    chunk_size = MAX_BIND_PARAMETERS // len(columns)
+    ids = {}
+    try:
+        for start in range(0, len(values), chunk_size):
+            res = await session.exec(
+                stmt.values(values[start : start + chunk_size])
+            )
+            ids.update({depth_key(row): row.id for row in res.all()})
+
+        await session.commit()
+    except IntegrityError:
+        # Other unique constraints, or rows written concurrently
+        await session.rollback()
+        raise HTTPException(status_code=409, detail=CONFLICT_DETAIL)
+
+    res = await session.exec(
+        select(PlotSample)
+        .where(PlotSample.id.in_(ids.values()))
+        .execution_options(populate_existing=True)
+    )
+    objs = {obj.id: obj for obj in res.all()}
+
+    return [objs[ids[depth_key(row)]] for row in rows]
+
+
+async def update_many(
+    samples: list[PlotSampleUpdateBatch],
+    session: AsyncSession,
+) -> list[PlotSample]:
+    """Update many plot samples in a single transaction
+
+    Plots are resolved for all rows in one query and the updates applied
+    with CRUD.bulk_update. Only the samples that changed are returned.
+    """
+
+    if not samples:
+        return []
+
+    rows = [sample.model_dump(exclude_unset=True) for sample in samples]
+    errors = await resolve_plot_ids(session, rows)
+
+    res = await session.exec(
+        select(PlotSample.id).where(
+            PlotSample.id.in_({row["id"] for row in rows})
+        )
+    )
+    existing = set(res.all())
+    for i, row in enumerate(rows):
+        if row["id"] not in existing:
+            errors.append(batch_error(i, ["id"], f"ID: {row['id']} not found"))
+
+    if errors:
+        raise BatchValidationError(errors)
+
+    try:
+        changed = await crud.bulk_update(session, rows)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=CONFLICT_DETAIL)
+
+    await session.commit()
+
+    res = await session.exec(
+        select(PlotSample)
+        .where(PlotSample.id.in_(changed))
+        .execution_options(populate_existing=True)
+    )
+    objs = {obj.id: obj for obj in res.all()}
+
+    return [objs[row["id"]] for row in rows if row["id"] in objs]
+
+
+# Numeric measures of the samples that can be aggregated
+MEASURES = [
+    column.name
+    for column in PlotSample.__table__.columns
+    if isinstance(column.type, sqlalchemy.Float)
+    and column.name not in ("upper_depth_cm", "lower_depth_cm")
+]
+
+AGGREGATE_GROUPS = ("project", "area", "plot", "gradient", "depth")
+
+
+async def aggregate(
+    session: AsyncSession,
+    measures: list[str],
+    group_by: list[str],
+    percentiles: list[float],
+    depth_band_cm: float,
+    project_id: UUID | None = None,
+    area_id: UUID | None = None,
+    plot_id: UUID | None = None,
+) -> list[PlotSampleAggregate]:
+    """Summarise sample measures by project, area, plot, gradient or depth
+
+    All groups and measures are computed in one GROUP BY query. Samples are
+    put in depth bands of depth_band_cm by their upper depth. Percentiles
+    are continuous (percentile_cont), all of a measure in one array.
+    """
+
+    for measure in measures:
+        if measure not in MEASURES:
+            raise ValidationError(
+                loc=["query", "measures"],
+                msg=f"Unknown measure: {measure}, use any of {MEASURES}",
+            )
+    for group in group_by:
+        if group not in AGGREGATE_GROUPS:
+            raise ValidationError(
+                loc=["query", "group_by"],
+                msg=f"Unknown group: {group}, use any of {AGGREGATE_GROUPS}",
+            )
+    for percentile in percentiles:
+        if not 0 <= percentile <= 1:
+            raise ValidationError(
+                loc=["query", "percentiles"],
+                msg=f"Percentile {percentile} is not between 0 and 1",
+            )
+    if depth_band_cm <= 0:
+        raise ValidationError(
+            loc=["query", "depth_band_cm"],
+            msg="Depth band must be positive",
+        )
+
+    # Rendered inline so the expression in SELECT and GROUP BY is the same
+    band = sqlalchemy.literal(
+        float(depth_band_cm), sqlalchemy.Float, literal_execute=True
+    )
+    depth_from = func.floor(PlotSample.upper_depth_cm / band) * band
+    group_columns = {
+        "project": [
+            Project.id.label("project_id"),
+            Project.name.label("project_name"),
+        ],
+        "area": [Area.id.label("area_id"), Area.name.label("area_name")],
+        "plot": [Plot.id.label("plot_id"), Plot.name.label("plot_name")],
+        "gradient": [cast(Plot.gradient, sqlalchemy.String).label("gradient")],
+        "depth": [depth_from.label("depth_from_cm")],
+    }
+    groups = [
+        column for group in group_by for column in group_columns[group]
+    ]
+
+    aggregates = []
+    for measure in measures:
+        value = getattr(PlotSample, measure)
+        aggregates.extend(
+            [
+                func.count(value).label(f"{measure}__count"),
+                func.avg(value).label(f"{measure}__mean"),
+                func.stddev_samp(value).label(f"{measure}__std"),
+                func.min(value).label(f"{measure}__min"),
+                func.max(value).label(f"{measure}__max"),
+            ]
+        )
+        if percentiles:
+            aggregates.append(
+                func.percentile_cont(
+                    postgresql.array(percentiles),
+                    type_=postgresql.ARRAY(sqlalchemy.Float),
+                )
+                .within_group(value)
+                .label(f"{measure}__percentiles")
+            )
+
+    query = (
+        select(*groups, *aggregates)
+        .select_from(PlotSample)
+        .join(Plot, PlotSample.plot_id == Plot.id)
+        .join(Area, Plot.area_id == Area.id)
+        .join(Project, Area.project_id == Project.id)
+        .group_by(*groups)
+        .order_by(*groups)
+    )
+    if project_id is not None:
+        query = query.where(Project.id == project_id)
+    if area_id is not None:
+        query = query.where(Area.id == area_id)
+    if plot_id is not None:
+        query = query.where(Plot.id == plot_id)
+
+    res = await session.exec(query)
+
+    summaries = []
+    for row in res.mappings().all():
+        summary = PlotSampleAggregate(
+            **{column.name: row[column.name] for column in groups}
+        )
+        if "depth" in group_by:
+            summary.depth_to_cm = summary.depth_from_cm + depth_band_cm
+        for measure in measures:
+            summary.measures[measure] = MeasureSummary(
+                count=row[f"{measure}__count"],
+                mean=row[f"{measure}__mean"],
+                std=row[f"{measure}__std"],
+                min=row[f"{measure}__min"],
+                max=row[f"{measure}__max"],
+                percentiles=dict(
+                    zip(
+                        [str(percentile) for percentile in percentiles],
+                        row.get(f"{measure}__percentiles") or [],
+                    )
+                ),
+            )
+        summaries.append(summary)
+
+    return summaries
+
+
+class CachedProfile(NamedTuple):
+    version: tuple  # Sample count and last update of the plot
+    values: np.ndarray
+
+
+profile_cache: LRUCache[tuple, CachedProfile] = LRUCache(
+    max_entries=config.DEPTH_PROFILE_CACHE_MAX_ENTRIES
+)
+
+
+def resample_depth_profile(
+    upper: np.ndarray,
+    lower: np.ndarray,
+    values: np.ndarray,
+    depth_from: np.ndarray,
+    depth_step: float,
+) -> np.ndarray:
+    """Resample the interval samples of a plot onto a regular depth grid
+
+    `values` has a row per sample and a column per property, NaN where
+    missing. Replicates (samples of the same interval) are averaged first,
+    then each step of the grid gets the mean of the intervals overlapping
+    it, weighted by the overlap. Returns an array of properties by steps,
+    NaN where no interval with a value covers a step.
+    """
+
+    intervals, inverse = np.unique(
+        np.column_stack([upper, lower]), axis=0, return_inverse=True
+    )
+    inverse = inverse.ravel()
+
+    valid = ~np.isnan(values)
+    sums = np.zeros((len(intervals), values.shape[1]))
+    counts = np.zeros((len(intervals), values.shape[1]))
+    np.add.at(sums, inverse, np.where(valid, values, 0))
+    np.add.at(counts, inverse, valid)
+    covered = counts > 0
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=covered)
+
+    # Overlap of each interval (rows) with each step of the grid (columns)
+    overlap = np.clip(
+        np.minimum(intervals[:, 1:2], depth_from + depth_step)
+        - np.maximum(intervals[:, 0:1], depth_from),
+        0,
+        None,
+    )
+    weights = overlap.T @ covered
+    totals = overlap.T @ means
+
+    profile = np.full(weights.shape, np.nan)
+    np.divide(totals, weights, out=profile, where=weights > 0)
+
+    return profile.T
+
+
+def resample_depth_profiles(
+    samples: dict[UUID, np.ndarray],
+    depth_from: np.ndarray,
+    depth_step: float,
+) -> dict[UUID, np.ndarray]:
+    """Resample the samples of many plots, with resample_depth_profile
+
+    `samples` has an array per plot of the upper and lower depth, then the
+    properties, of each sample. Run in the compute process pool.
+    """
+
+    return {
+        plot_id: resample_depth_profile(
+            data[:, 0], data[:, 1], data[:, 2:], depth_from, depth_step
+        )
+        for plot_id, data in samples.items()
+    }
+
+
+async def get_depth_profiles(
+    session: AsyncSession,
+    properties: list[str],
+    plot_ids: list[UUID],
+    area_id: UUID | None = None,
+    depth_step_cm: float = 5,
+    max_depth_cm: float | None = None,
+) -> DepthProfiles:
+    """Depth profiles of sample properties for many plots
+
+    The samples of the given plots (and of all plots of the area) are
+    resampled onto a grid of depth_step_cm from the surface to max_depth_cm,
+    by default the deepest sample of the plots. Profiles are cached per
+    plot and grid until the samples of the plot change (their count or
+    last update), so only the plots with new samples are read and
+    resampled.
+    """
+
+    for prop in properties:
+        if prop not in MEASURES:
+            raise ValidationError(
+                loc=["query", "properties"],
+                msg=f"Unknown property: {prop}, use any of {MEASURES}",
+            )
+    if not math.isfinite(depth_step_cm) or depth_step_cm <= 0:
+        raise ValidationError(
+            loc=["query", "depth_step_cm"],
+            msg="Depth step must be a positive number",
+        )
+    if max_depth_cm is not None and (
+        not math.isfinite(max_depth_cm) or max_depth_cm < 0
+    ):
+        raise ValidationError(
+            loc=["query", "max_depth_cm"],
+            msg="Maximum depth must be a non-negative number",
+        )
+
+    plot_ids = list(plot_ids)
+    if area_id is not None:
+        res = await session.exec(
+            select(Plot.id).where(Plot.area_id == area_id).order_by(Plot.name)
+        )
+        plot_ids.extend(res.all())
+    plot_ids = list(dict.fromkeys(plot_ids))
+    if not plot_ids:
+        raise ValidationError(
+            loc=["query"], msg="Either plot_id or area_id is required"
+        )
+
+    res = await session.exec(
+        select(
+            PlotSample.plot_id,
+            func.count(PlotSample.id),
+            func.max(PlotSample.last_updated),
+            func.max(PlotSample.lower_depth_cm),
+        )
+        .where(PlotSample.plot_id.in_(plot_ids))
+        .group_by(PlotSample.plot_id)
+    )
+    versions = {}
+    deepest = 0.0
+    for plot_id, count, last_updated, lower in res.all():
+        versions[plot_id] = (count, last_updated)
+        deepest = max(deepest, lower or 0.0)
+
+    if max_depth_cm is None:
+        max_depth_cm = deepest
+    if max_depth_cm / depth_step_cm > config.DEPTH_PROFILE_MAX_STEPS:
+        raise ValidationError(
+            loc=["query", "depth_step_cm"],
+            msg=(
+                f"The depth grid to {max_depth_cm} cm in steps of "
+                f"{depth_step_cm} cm exceeds the maximum of "
+                f"{config.DEPTH_PROFILE_MAX_STEPS} steps"
+            ),
+        )
+    depth_from = np.arange(0, max_depth_cm, depth_step_cm, dtype=float)
+
+    def cache_key(plot_id: UUID) -> tuple:
+        return (plot_id, tuple(properties), depth_step_cm, max_depth_cm)
+
+    profiles = {}
+    for plot_id, version in versions.items():
+        cached = profile_cache.get(cache_key(plot_id))
+        if cached is not None and cached.version == version:
+            profiles[plot_id] = cached.values
+
+    missing = [plot_id for plot_id in versions if plot_id not in profiles]
+    if missing:
+        res = await session.exec(
+            select(
+                PlotSample.plot_id,
+                PlotSample.upper_depth_cm,
+                PlotSample.lower_depth_cm,
+                *[getattr(PlotSample, prop) for prop in properties],
+            )
+            .where(PlotSample.plot_id.in_(missing))
+            .order_by(PlotSample.plot_id)
+        )
+        rows: dict[UUID, list] = {}
+        for row in res.all():
+            rows.setdefault(row[0], []).append(row[1:])
+        samples = {
+            plot_id: np.array(plot_rows, dtype=float).reshape(
+                len(plot_rows), -1
+            )
+            for plot_id, plot_rows in rows.items()
+        }
+
+        resampled = await run_in_process(
+            resample_depth_profiles, samples, depth_from, depth_step_cm
+        )
+        for plot_id, values in resampled.items():
+            profile_cache.set(
+                cache_key(plot_id), CachedProfile(versions[plot_id], values)
+            )
+            profiles[plot_id] = values
+
+    empty = np.full((len(properties), len(depth_from)), np.nan)
+
+    return DepthProfiles(
+        properties=properties,
+        depth_from_cm=depth_from.tolist(),
+        depth_step_cm=depth_step_cm,
+        plots=[
+            PlotDepthProfile(
+                plot_id=plot_id,
+                values=[
+                    [None if np.isnan(value) else value for value in row]
+                    for row in profiles.get(plot_id, empty).tolist()
+                ],
+            )
+            for plot_id in plot_ids
+        ],
+    )
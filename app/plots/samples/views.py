@@ -4,9 +4,11 @@ from app.plots.samples.models import (
     PlotSampleCreate,
     PlotSampleUpdate,
     PlotSampleUpdateBatch,
+    PlotSampleAggregate,
+    DepthProfiles,
 )
 from app.db import get_session, AsyncSession
-from fastapi import Depends, APIRouter, Response
+from fastapi import Depends, APIRouter, Response, Query
 from uuid import UUID
 from app.crud import CRUD
 from app.plots.samples.services import (
@@ -15,15 +17,94 @@ from app.plots.samples.services import (
     get_count,
     create_one,
     update_one,
+    upsert_many,
+    update_many as update_many_samples,
+    aggregate,
+    MEASURES,
+    get_depth_profiles,
+    TABLES_TO_JOIN,
+    FIELDS_TO_QUERY,
 )
+from app.utils.responses import CachedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 crud = CRUD(
     PlotSample, PlotSampleReadWithPlot, PlotSampleCreate, PlotSampleUpdate
 )
 
 
-@router.get("/{plot_sample_id}", response_model=PlotSampleReadWithPlot)
+@router.get("/aggregate", response_model=list[PlotSampleAggregate])
+async def get_plot_sample_aggregates(
+    measures: list[str] = Query(
+        MEASURES, description="Measures to summarise, all by default"
+    ),
+    group_by: list[str] = Query(
+        [],
+        description=(
+            "Group by any of project, area, plot, gradient and depth "
+            "(the depth band of the upper depth)"
+        ),
+    ),
+    percentiles: list[float] = Query(
+        [0.25, 0.5, 0.75], description="Percentiles, between 0 and 1"
+    ),
+    depth_band_cm: float = Query(10, description="Size of the depth bands"),
+    project_id: UUID | None = Query(None),
+    area_id: UUID | None = Query(None),
+    plot_id: UUID | None = Query(None),
+    session: AsyncSession = Depends(get_session),
+) -> list[PlotSampleAggregate]:
+    """Get the count, mean, std, min, max and percentiles of sample measures
+
+    Computed over the groups given in group_by, or all samples if none
+    """
+
+    return await aggregate(
+        session,
+        measures=measures,
+        group_by=group_by,
+        percentiles=percentiles,
+        depth_band_cm=depth_band_cm,
+        project_id=project_id,
+        area_id=area_id,
+        plot_id=plot_id,
+    )
+
+
+@router.get("/profiles", response_model=DepthProfiles)
+async def get_plot_sample_depth_profiles(
+    properties: list[str] = Query(..., description="Measures to profile"),
+    plot_id: list[UUID] = Query([], description="Plots to profile"),
+    area_id: UUID | None = Query(
+        None, description="Profile all plots of the area"
+    ),
+    depth_step_cm: float = Query(5, description="Step of the depth grid"),
+    max_depth_cm: float | None = Query(
+        None, description="Depth of the grid, by default the deepest sample"
+    ),
+    session: AsyncSession = Depends(get_session),
+) -> DepthProfiles:
+    """Get the depth profiles of sample properties for many plots
+
+    Replicates are averaged and the sample intervals resampled onto a
+    regular depth grid. Values are by plot, then property, then depth.
+    """
+
+    return await get_depth_profiles(
+        session,
+        properties=properties,
+        plot_ids=plot_id,
+        area_id=area_id,
+        depth_step_cm=depth_step_cm,
+        max_depth_cm=max_depth_cm,
+    )
+
+
+@router.get(
+    "/{plot_sample_id}",
+    response_model=PlotSampleReadWithPlot,
+    dependencies=[Depends(crud.detail_etag(related=TABLES_TO_JOIN))],
+)
 async def get_plot_sample(
     obj: CRUD = Depends(get_one),
 ) -> PlotSampleReadWithPlot:
@@ -32,7 +113,19 @@ async def get_plot_sample(
     return obj
 
 
-@router.get("", response_model=list[PlotSampleReadWithPlot])
+@router.get(
+    "",
+    response_model=list[PlotSampleReadWithPlot],
+    dependencies=[
+        Depends(
+            crud.list_etag(
+                filter_models_to_join=TABLES_TO_JOIN,
+                filter_fields_to_query=FIELDS_TO_QUERY,
+                related=TABLES_TO_JOIN,
+            )
+        )
+    ],
+)
 async def get_all_plot_samples(
     response: Response,
     plot_samples: CRUD = Depends(get_data),
@@ -48,18 +141,12 @@ async def update_many(
     plot_samples: list[PlotSampleUpdateBatch],
     session: AsyncSession = Depends(get_session),
 ) -> list[PlotSampleReadWithPlot]:
-    """Update plot samples from a list of PlotSampleUpdate objects"""
-
-    objs = []
-    for plot_sample in plot_samples:
-        obj = await update_one(
-            plot_sample_id=plot_sample.id,
-            plot_sample_update=plot_sample,
-            session=session,
-        )
-        objs.append(obj)
+    """Update plot samples from a list of PlotSampleUpdate objects
 
-    return objs
+    Only the samples that changed are returned
+    """
+
+    return await update_many_samples(plot_samples, session)
 
 
 @router.put("/{plot_sample_id}", response_model=PlotSampleReadWithPlot)
@@ -88,14 +175,9 @@ async def create_plot_sample_batch(
     objs: list[PlotSampleCreate],
     session: AsyncSession = Depends(get_session),
 ) -> list[PlotSampleReadWithPlot]:
-    """Creates a many from a list"""
-
-    created_objs = []
-    for obj in objs:
-        obj = await create_one(obj.model_dump(), session)
-        created_objs.append(obj)
+    """Creates many from a list, updating samples with the same depths"""
 
-    return created_objs
+    return await upsert_many(objs, session)
 
 
 @router.delete("/batch", response_model=list[str])
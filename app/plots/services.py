@@ -1,8 +1,11 @@
 from app.plots.models import (
     Plot,
     PlotCreate,
+    PlotRead,
     PlotReadWithSamples,
     PlotUpdate,
+    PlotUpdateBatch,
+    SensorDistance,
 )
 from app.db import get_session, AsyncSession
 from fastapi import (
@@ -16,11 +19,23 @@ from fastapi import (
 from uuid import UUID
 from app.crud import CRUD
 from app.areas.models import Area
-from app.utils.funcs import set_elevation_to_db_obj
+from app.areas.services import refresh_area_geometry
+from app.references.services import area_cache
+from app.sensors.models import Sensor
+from app.utils.funcs import resize_base64_images
+from app.elevation.services import schedule_elevations
 from sqlmodel import select
-from sqlalchemy import func
-from sqlalchemy.exc import NoResultFound
-from app.exceptions import ValidationError
+from sqlalchemy import func, true, cast, tuple_, String
+from sqlalchemy.exc import IntegrityError
+from app.exceptions import (
+    ValidationError,
+    BatchValidationError,
+    batch_error,
+)
+from app.utils.validators import (
+    validate_with_geometries,
+    point_geometries_from_rows,
+)
 
 router = APIRouter()
 
@@ -66,10 +81,15 @@ async def get_data(
         session=session,
         filter_models_to_join=TABLES_TO_JOIN,
         filter_fields_to_query=FIELDS_TO_QUERY,
+        point_coordinates=True,
     )
     print("Total results:", len(res))
 
-    return res
+    return validate_with_geometries(
+        PlotRead,
+        [row[0] for row in res],
+        geometries=point_geometries_from_rows(res),
+    )
 
 
 async def get_one(
@@ -83,6 +103,63 @@ async def get_one(
     return res
 
 
+async def get_nearest_sensors(
+    session: AsyncSession,
+    plot_ids: list[UUID],
+    limit: int | None = None,
+    max_distance: float | None = None,
+) -> dict[UUID, list[SensorDistance]]:
+    """Find the nearest sensors in the same area for each plot
+
+    For every plot, a LATERAL subquery orders the sensors with the KNN
+    operator (<->) so the GiST index on the sensor geometry returns them
+    nearest first, instead of computing and sorting all distances. The
+    `limit` nearest sensors within `max_distance` (in the units of the SRID,
+    metres for LV95) are returned, ordered by distance.
+    """
+
+    nearest = select(
+        Sensor.id,
+        Sensor.name,
+        func.st_distance(Plot.geom, Sensor.geom).label("distance"),
+        (func.st_z(Plot.geom) - func.st_z(Sensor.geom)).label(
+            "elevation_difference"
+        ),
+    ).where(Sensor.area_id == Plot.area_id)
+
+    if max_distance is not None:
+        nearest = nearest.where(
+            func.st_dwithin(Sensor.geom, Plot.geom, max_distance)
+        )
+
+    nearest = (
+        nearest.order_by(Sensor.geom.op("<->")(Plot.geom))
+        .limit(limit)
+        .lateral("nearest")
+    )
+
+    res = await session.exec(
+        select(Plot.id.label("plot_id"), nearest)
+        .select_from(Plot)
+        .join(nearest, true())
+        .where(Plot.id.in_(plot_ids))
+        .order_by(Plot.id, nearest.c.distance)
+    )
+
+    sensors = {plot_id: [] for plot_id in plot_ids}
+    for row in res.all():
+        sensors[row.plot_id].append(
+            SensorDistance(
+                id=row.id,
+                name=row.name,
+                distance=row.distance,
+                elevation_difference=row.elevation_difference,
+            )
+        )
+
+    return sensors
+
+
 async def create_one(
     data: dict,
     session: AsyncSession,
@@ -95,45 +172,176 @@ async def create_one(
 
     # If area name is given, find area by name (ensuring uniqueness) else id
     if data.get("area_name"):
-        try:
-            res = await session.exec(
-                select(Area).where(
-                    func.lower(Area.name) == data.get("area_name").lower()
-                )
-            )
-            area_obj = res.one()
-        except NoResultFound:
+        areas = await area_cache.find(session, data["area_name"])
+        if len(areas) != 1:
             raise ValidationError(
                 loc=["body", "area_name"],
-                msg=f"Area name: {data.get('area_name')} not found",
+                msg=f"Area name: {data.get('area_name')} "
+                + ("not found" if not areas else "is not unique"),
             )
 
-        data["area_id"] = area_obj.id
-    else:
-        res = await session.exec(
-            select(Area).where(Area.id == data.get("area_id"))
+        data["area_id"] = areas[0].id
+    elif await area_cache.get(session, data.get("area_id")) is None:
+        raise ValidationError(
+            loc=["body", "area_id"],
+            msg=f"Area ID: {data.get('area_id')} not found",
         )
-        area_obj = res.one()
+
+    await resize_base64_images(data, ["image"])
 
     obj = Plot.model_validate(data)
 
     session.add(obj)
+    await refresh_area_geometry(session, [obj.area_id])
 
     await session.commit()
     await session.refresh(obj)
 
     if float(data["coord_z"]) == 0:
-        # Start background process
-        background_tasks.add_task(
-            set_elevation_to_db_obj,
-            id=obj.id,
-            crud_instance=crud,
-            session=session,
-        )
+        # Resolved after the response, together with the other plots created
+        # in the same request
+        schedule_elevations(background_tasks, Plot, obj.id)
 
     return obj
 
 
+async def resolve_area_ids(
+    session: AsyncSession,
+    rows: list[dict],
+) -> list[dict]:
+    """Set the area ID of many plot rows, returning the errors of each row
+
+    Rows with an area name are matched on it case insensitively, the others
+    must reference an existing area ID. Rows with neither are left as they
+    are. Areas are looked up in the reference cache.
+    """
+
+    errors = []
+    for i, row in enumerate(rows):
+        if row.get("area_name"):
+            matches = await area_cache.find(session, row["area_name"])
+            if len(matches) == 1:
+                row["area_id"] = matches[0].id
+            else:
+                errors.append(
+                    batch_error(
+                        i,
+                        ["area_name"],
+                        f"Area name: {row['area_name']} "
+                        + ("not found" if not matches else "is not unique"),
+                    )
+                )
+        elif (
+            "area_id" in row
+            and await area_cache.get(session, row["area_id"]) is None
+        ):
+            errors.append(
+                batch_error(
+                    i, ["area_id"], f"Area ID: {row['area_id']} not found"
+                )
+            )
+
+    return errors
+
+
+async def create_many(
+    plots: list[PlotCreate],
+    session: AsyncSession,
+    background_tasks: BackgroundTasks,
+) -> list[Plot]:
+    """Create many plots in a single transaction
+
+    The areas of all rows are resolved in one query and every row is
+    validated (area, image, unique name and plot number) before anything is
+    written. If any row fails, nothing is created and the errors of all rows
+    are returned together, with the row index in their loc. The plots are
+    then inserted together, the hulls of their areas refreshed once and the
+    missing elevations resolved in one background task.
+    """
+
+    if not plots:
+        return []
+
+    rows = [plot.model_dump() for plot in plots]
+    errors = await resolve_area_ids(session, rows)
+
+    for i, row in enumerate(rows):
+        try:
+            await resize_base64_images(row, ["image"])
+        except ValidationError as e:
+            errors.append(batch_error(i, ["image"], e.detail[0]["msg"]))
+
+    # Unique constraints, within the batch and against the existing plots
+    names = [row.get("name") for row in rows]
+    keys = [
+        (row.get("plot_iterator"), row.get("area_id"), row["gradient"].value)
+        for row in rows
+    ]
+    res = await session.exec(
+        select(
+            Plot.name,
+            Plot.plot_iterator,
+            Plot.area_id,
+            cast(Plot.gradient, String).label("gradient"),
+        ).where(
+            Plot.name.in_({name for name in names if name is not None})
+            | tuple_(
+                Plot.plot_iterator, Plot.area_id, cast(Plot.gradient, String)
+            ).in_(set(keys))
+        )
+    )
+    existing = res.all()
+    taken_names = {plot.name for plot in existing}
+    taken_keys = {
+        (plot.plot_iterator, plot.area_id, plot.gradient) for plot in existing
+    }
+
+    for i, (name, key) in enumerate(zip(names, keys)):
+        if name is not None:
+            if name in taken_names:
+                errors.append(
+                    batch_error(
+                        i, ["name"], f"Plot name: {name} already exists"
+                    )
+                )
+            taken_names.add(name)
+        if key[1] is not None:
+            if key in taken_keys:
+                errors.append(
+                    batch_error(
+                        i,
+                        ["plot_iterator"],
+                        f"Plot {key[0]} ({key[2]}) already exists in the area",
+                    )
+                )
+            taken_keys.add(key)
+
+    if errors:
+        raise BatchValidationError(errors)
+
+    objs = [Plot.model_validate(row) for row in rows]
+
+    # Inserted in multi-row INSERT ... RETURNING statements on flush
+    session.add_all(objs)
+    await refresh_area_geometry(session, {obj.area_id for obj in objs})
+
+    await session.commit()
+
+    # Load the relationships of all new plots together
+    res = await session.exec(
+        select(Plot)
+        .where(Plot.id.in_([obj.id for obj in objs]))
+        .execution_options(populate_existing=True)
+    )
+    created = {obj.id: obj for obj in res.all()}
+
+    for row, obj in zip(rows, objs):
+        if not row.get("coord_z"):
+            schedule_elevations(background_tasks, Plot, obj.id)
+
+    return [created[obj.id] for obj in objs]
+
+
 async def update_one(
     plot_id: UUID,
     plot_update: PlotUpdate,
@@ -149,31 +357,94 @@ async def update_one(
     # If area id exists, use it, otherwise use the name if it exists
     # This allows the import CSV to use the area name (improve user experience)
     if update_data.get("area_name"):
-        try:
-            res = await session.exec(
-                select(Area).where(
-                    func.lower(Area.name)
-                    == update_data.get("area_name").lower()
-                )
-            )
-            area_obj = res.one()  # Make sure only one returns
-        except NoResultFound:
+        areas = await area_cache.find(session, update_data["area_name"])
+        if len(areas) != 1:  # Make sure only one matches
             raise ValidationError(
                 loc=["body", "area_name"],
-                msg=f"Area name: {update_data.get('area_name')} not found",
+                msg=f"Area name: {update_data.get('area_name')} "
+                + ("not found" if not areas else "is not unique"),
             )
-        update_data["area_id"] = area_obj.id
+        update_data["area_id"] = areas[0].id
 
-    else:
-        res = await session.exec(
-            select(Area).where(Area.id == update_data.get("area_id"))
+    elif await area_cache.get(session, update_data.get("area_id")) is None:
+        raise ValidationError(
+            loc=["body", "area_id"],
+            msg=f"Area ID: {update_data.get('area_id')} not found",
         )
-        area_obj = res.one()
 
+    await resize_base64_images(update_data, ["image"])
+
+    previous_area_id = obj.area_id
     obj.sqlmodel_update(update_data)
 
     session.add(obj)
+    await refresh_area_geometry(session, [previous_area_id, obj.area_id])
     await session.commit()
     await session.refresh(obj)
 
     return obj
+
+
+async def update_many(
+    plots: list[PlotUpdateBatch],
+    session: AsyncSession,
+) -> list[Plot]:
+    """Update many plots in a single transaction
+
+    Areas are resolved for all rows in one query and the updates applied
+    with CRUD.bulk_update. Only the plots that changed are returned, and
+    only their areas have their hull refreshed.
+    """
+
+    if not plots:
+        return []
+
+    rows = [plot.model_dump(exclude_unset=True) for plot in plots]
+    errors = await resolve_area_ids(session, rows)
+
+    res = await session.exec(
+        select(Plot.id, Plot.area_id).where(
+            Plot.id.in_({row["id"] for row in rows})
+        )
+    )
+    previous_area_ids = dict(res.all())
+
+    for i, row in enumerate(rows):
+        if row["id"] not in previous_area_ids:
+            errors.append(batch_error(i, ["id"], f"ID: {row['id']} not found"))
+        try:
+            await resize_base64_images(row, ["image"])
+        except ValidationError as e:
+            errors.append(batch_error(i, ["image"], e.detail[0]["msg"]))
+
+    if errors:
+        raise BatchValidationError(errors)
+
+    try:
+        changed = set(await crud.bulk_update(session, rows))
+    except IntegrityError:
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                "Either a plot name is not unique, or a plot with the same "
+                "iterator and gradient already exists in the area."
+            ),
+        )
+
+    area_ids = set()
+    for row in rows:
+        if row["id"] in changed:
+            area_ids.add(previous_area_ids[row["id"]])
+            area_ids.add(row.get("area_id", previous_area_ids[row["id"]]))
+    await refresh_area_geometry(session, area_ids)
+
+    await session.commit()
+
+    res = await session.exec(
+        select(Plot)
+        .where(Plot.id.in_(changed))
+        .execution_options(populate_existing=True)
+    )
+    objs = {obj.id: obj for obj in res.all()}
+
+    return [objs[row["id"]] for row in rows if row["id"] in objs]
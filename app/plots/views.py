@@ -5,6 +5,7 @@ from app.plots.models import (
     PlotReadWithSamples,
     PlotUpdate,
     PlotUpdateBatch,
+    PlotNearestSensors,
 )
 from app.db import get_session, AsyncSession
 from fastapi import (
@@ -17,64 +18,97 @@ from fastapi import (
 from uuid import UUID
 from app.crud import CRUD
 from app.areas.models import Area
-from app.sensors.models import Sensor
-from sqlmodel import select
+from app.areas.services import refresh_area_geometry
 from app.plots.services import (
     get_count,
     get_data,
     get_one,
     create_one,
+    create_many as create_many_plots,
     update_one,
+    update_many as update_many_plots,
+    get_nearest_sensors,
     crud,
+    TABLES_TO_JOIN,
+    FIELDS_TO_QUERY,
 )
-from sqlmodel import func
+from app.plots.samples.models import PlotSample
+from app.sensors.models import Sensor
+from app.transects.models.transects import Transect
+from app.utils.responses import CachedRoute
+
+router = APIRouter(route_class=CachedRoute)
 
-router = APIRouter()
+
+@router.post("/nearest_sensors", response_model=list[PlotNearestSensors])
+async def get_plots_nearest_sensors(
+    plot_ids: list[UUID],
+    limit: int | None = Query(
+        None, ge=1, description="Number of sensors to return for each plot"
+    ),
+    max_distance: float | None = Query(
+        None, gt=0, description="Maximum distance of the sensors (metres)"
+    ),
+    session: AsyncSession = Depends(get_session),
+) -> list[PlotNearestSensors]:
+    """Get the nearest sensors in the same area for many plots at once"""
+
+    sensors = await get_nearest_sensors(
+        session, plot_ids, limit=limit, max_distance=max_distance
+    )
+
+    return [
+        PlotNearestSensors(plot_id=plot_id, sensors=plot_sensors)
+        for plot_id, plot_sensors in sensors.items()
+    ]
 
 
-@router.get("/{plot_id}", response_model=PlotReadWithSamples)
+@router.get(
+    "/{plot_id}",
+    response_model=PlotReadWithSamples,
+    dependencies=[
+        Depends(
+            crud.detail_etag(related=[Area, PlotSample, Sensor, Transect])
+        )
+    ],
+)
 async def get_plot(
     plot_id: UUID,
+    limit: int | None = Query(
+        None, ge=1, description="Number of nearest sensors to include"
+    ),
+    max_distance: float | None = Query(
+        None, gt=0, description="Maximum distance of the sensors (metres)"
+    ),
     session: AsyncSession = Depends(get_session),
 ) -> PlotReadWithSamples:
-    """Get a plot by id including the distances to all sensors in the same area"""
+    """Get a plot by id including the distances to the sensors in its area"""
 
     # Fetch the plot by ID
     plot = await get_one(plot_id, session=session)
     plot = PlotReadWithSamples.model_validate(plot)
 
-    # Custom SQL query to get all sensors and their distances to the plot
-    stmt = (
-        select(
-            Sensor,
-            func.st_distance(Plot.geom, Sensor.geom).label("distance"),
-            (func.st_z(Plot.geom) - func.st_z(Sensor.geom)).label(
-                "elevation_difference"
-            ),
-        )
-        .where(Plot.id == plot_id)
-        .where(Sensor.area_id == plot.area_id)
-        .order_by(func.st_distance(Plot.geom, Sensor.geom))
+    # Sensors of the same area, nearest first
+    sensors = await get_nearest_sensors(
+        session, [plot_id], limit=limit, max_distance=max_distance
     )
-
-    result = await session.exec(stmt)
-    sensors = result.fetchall()
-
-    # Prepare a list of sensors with their distances
-    plot.sensors = [
-        {
-            "id": sensor.id,
-            "distance": distance,
-            "name": sensor.name,
-            "elevation_difference": elevation_difference,
-        }
-        for sensor, distance, elevation_difference in sensors
-    ]
+    plot.sensors = sensors[plot_id]
 
     return plot
 
 
-@router.get("")
+@router.get(
+    "",
+    dependencies=[
+        Depends(
+            crud.list_etag(
+                filter_models_to_join=TABLES_TO_JOIN,
+                filter_fields_to_query=FIELDS_TO_QUERY,
+                related=[Area],
+            )
+        )
+    ],
+)
 async def get_all_plots(
     response: Response,
     plots: Plot = Depends(get_data),
@@ -111,12 +145,7 @@ async def create_many(
 ) -> list[PlotReadWithSamples]:
     """Creates plots from a list of PlotCreate objects"""
 
-    objs = []
-    for plot in plots:
-        obj = await create_one(plot.model_dump(), session, background_tasks)
-        objs.append(obj)
-
-    return objs
+    return await create_many_plots(plots, session, background_tasks)
 
 
 @router.put("/batch", response_model=list[PlotReadWithSamples])
@@ -124,16 +153,12 @@ async def update_many(
     plots: list[PlotUpdateBatch],
     session: AsyncSession = Depends(get_session),
 ) -> list[PlotReadWithSamples]:
-    """Update plots from a list of PlotUpdate objects"""
+    """Update plots from a list of PlotUpdate objects
 
-    objs = []
-    for plot in plots:
-        obj = await update_one(
-            plot_id=plot.id, plot_update=plot, session=session
-        )
-        objs.append(obj)
+    Only the plots that changed are returned
+    """
 
-    return objs
+    return await update_many_plots(plots, session)
 
 
 @router.put("/{plot_id}", response_model=PlotReadWithSamples)
@@ -152,11 +177,14 @@ async def delete_batch(
 ) -> list[str]:
     """Delete by a list of ids"""
 
+    area_ids = set()
     for id in ids:
         obj = await crud.get_model_by_id(model_id=id, session=session)
         if obj:
+            area_ids.add(obj.area_id)
             await session.delete(obj)
 
+    await refresh_area_geometry(session, area_ids)
     await session.commit()
 
     return [str(obj_id) for obj_id in ids]
@@ -170,6 +198,7 @@ async def delete_plot(
     """Delete a plot by id"""
 
     await session.delete(plot)
+    await refresh_area_geometry(session, [plot.area_id])
     await session.commit()
 
     return {"ok": True}
@@ -10,8 +10,14 @@ from sqlmodel import select
 from uuid import UUID
 from typing import Any
 from app.crud import CRUD
+from app.references.services import (
+    project_cache,
+    invalidate_references,
+)
+from app.areas.models import Area
+from app.utils.responses import CachedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 crud = CRUD(Project, ProjectRead, ProjectCreate, ProjectUpdate)
 
 
@@ -62,7 +68,11 @@ async def get_one(
     return res
 
 
-@router.get("/{project_id}", response_model=ProjectRead)
+@router.get(
+    "/{project_id}",
+    response_model=ProjectRead,
+    dependencies=[Depends(crud.detail_etag(related=[Area]))],
+)
 async def get_Project(
     # session: AsyncSession = Depends(get_session),
     # *,
@@ -73,7 +83,11 @@ async def get_Project(
     return obj
 
 
-@router.get("", response_model=list[ProjectRead])
+@router.get(
+    "",
+    response_model=list[ProjectRead],
+    dependencies=[Depends(crud.list_etag(related=[Area]))],
+)
 async def get_all_Projects(
     response: Response,
     projects: CRUD = Depends(get_data),
@@ -95,6 +109,7 @@ async def create_Project(
 
     session.add(obj)
 
+    await invalidate_references(session, project_cache)
     await session.commit()
     await session.refresh(obj)
 
@@ -114,6 +129,7 @@ async def update_Project(
     project.sqlmodel_update(update_data)
 
     session.add(project)
+    await invalidate_references(session, project_cache)
     await session.commit()
     await session.refresh(project)
 
@@ -132,6 +148,7 @@ async def delete_batch(
         if obj:
             await session.delete(obj)
 
+    await invalidate_references(session, project_cache)
     await session.commit()
 
     return [str(obj_id) for obj_id in ids]
@@ -145,6 +162,7 @@ async def delete_Project(
     """Delete a project by id"""
 
     await session.delete(project)
+    await invalidate_references(session, project_cache)
     await session.commit()
 
     return {"ok": True}
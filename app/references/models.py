@@ -0,0 +1,10 @@
+from sqlmodel import SQLModel, Field
+
+
+class ReferenceVersion(SQLModel, table=True):
+    """Version of a reference table cached in process, incremented on every
+    change so that all workers can tell when their cache is stale
+    """
+
+    name: str = Field(primary_key=True)  # Table name of the model
+    version: int = Field(default=0, nullable=False)
@@ -0,0 +1,119 @@
+from app.references.models import ReferenceVersion
+from app.projects.models import Project
+from app.areas.models import Area
+from app.soil.types.models import SoilType
+from app.db import AsyncSession
+from geoalchemy2 import Geometry
+from sqlalchemy import Row
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from typing import Any, Generic, TypeVar
+from uuid import UUID
+import weakref
+
+T = TypeVar("T")
+
+
+class ReferenceCache(Generic[T]):
+    """In-process cache of a small, rarely changing table
+
+    Rows are kept by id and by lower-cased name as snapshots of their
+    columns (geometries excluded), not as ORM objects, so they can be shared
+    between sessions and do not load any relationship. Before each use the
+    version of the table is checked with a single primary key lookup, and
+    all rows are reloaded if another worker (or this one) changed them, see
+    invalidate_references.
+    """
+
+    def __init__(self, model: type[T]):
+        self.model = model
+        self.name = model.__tablename__
+        self.columns = [
+            column
+            for column in model.__table__.columns
+            if not isinstance(column.type, Geometry)
+        ]
+
+        self.version: int | None = None
+        self.checked: weakref.ref | None = None  # Session of the last check
+        self.by_id: dict[UUID, Row] = {}
+        self.by_name: dict[str, list[Row]] = {}
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """Reload the rows if the version of the table has changed"""
+
+        if self.checked is not None and self.checked() is session:
+            return
+
+        res = await session.exec(
+            select(ReferenceVersion.version).where(
+                ReferenceVersion.name == self.name
+            )
+        )
+        version = res.one_or_none() or 0
+        if version == self.version:
+            self.checked = weakref.ref(session)
+            return
+
+        # Read after the version, a change in between only reloads again
+        res = await session.exec(select(*self.columns))
+        rows = res.all()
+
+        self.by_id = {row.id: row for row in rows}
+        self.by_name = {}
+        for row in rows:
+            if row.name is not None:
+                self.by_name.setdefault(row.name.lower(), []).append(row)
+        self.version = version
+        self.checked = weakref.ref(session)
+
+    def clear(self) -> None:
+        self.version = None
+        self.checked = None
+        self.by_id = {}
+        self.by_name = {}
+
+    async def get(self, session: AsyncSession, id: UUID) -> Row | None:
+        """Get a row by id"""
+
+        await self.refresh(session)
+
+        return self.by_id.get(id)
+
+    async def find(self, session: AsyncSession, name: str) -> list[Row]:
+        """Get the rows with a name, case insensitively
+
+        Names are not unique across projects for all models, so all matching
+        rows are returned.
+        """
+
+        await self.refresh(session)
+
+        return self.by_name.get(name.lower(), [])
+
+
+project_cache: ReferenceCache[Project] = ReferenceCache(Project)
+area_cache: ReferenceCache[Area] = ReferenceCache(Area)
+soil_type_cache: ReferenceCache[SoilType] = ReferenceCache(SoilType)
+
+
+async def invalidate_references(
+    session: AsyncSession,
+    *caches: ReferenceCache[Any],
+) -> None:
+    """Mark the cached rows of the given tables as stale in all workers
+
+    Increments the version of the tables in the session's transaction, call
+    it before committing any change to a cached table.
+    """
+
+    for cache in caches:
+        await session.exec(
+            insert(ReferenceVersion)
+            .values(name=cache.name, version=1)
+            .on_conflict_do_update(
+                index_elements=[ReferenceVersion.name],
+                set_={"version": ReferenceVersion.version + 1},
+            )
+        )
+        cache.clear()
@@ -14,22 +14,56 @@ from fastapi import Depends, APIRouter, Query, Response, HTTPException
 from sqlmodel import select, delete
 from uuid import UUID
 from app.crud import CRUD
+from app.areas.services import refresh_area_geometry
 from app.utils.funcs import decode_base64
 import csv
 from datetime import datetime
 import numpy as np
 from lttb import downsample
+from app.compute import run_in_process
+from app.utils.validators import (
+    validate_with_geometries,
+    point_geometries_from_rows,
+)
 
 crud = CRUD(Sensor, SensorRead, SensorCreate, SensorUpdate)
 
 
-def simplify_sensor_data_lttb(
+def downsample_sensor_fields(
+    times: np.ndarray,
+    fields: dict[str, np.ndarray],
+    target_points: int,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Apply LTTB to the time axis and to each field against time
+
+    Only takes and returns NumPy arrays so it can run in the process pool.
+
+    Returns the downsampled timestamps and the downsampled values of each
+    field.
+    """
+
+    # LTTB expects a 2-column array, so duplicate the x-axis
+    time_data = np.stack([times, times], axis=-1)
+    downsampled_times = downsample(time_data, target_points)[:, 0]
+
+    # Now, apply the LTTB algorithm for each y-axis variable separately
+    downsampled_fields = {}
+    for name, field_data in fields.items():
+        y_data = np.stack([times, field_data], axis=-1)
+        downsampled_fields[name] = downsample(y_data, target_points)[:, 1]
+
+    return downsampled_times, downsampled_fields
+
+
+async def simplify_sensor_data_lttb(
     data: list[SensorDataBase], target_points: int = 100
 ) -> list[SensorDataBase]:
     """
     Simplifies the sensor data using the Largest-Triangle-Three-Buckets (LTTB) algorithm, applied to each
     variable that needs downsampling, while preserving the rest of the data.
 
+    The downsampling itself is dispatched to the compute process pool.
+
     Args:
         data: List of SensorDataRead containing time series sensor data.
         target_points: The target number of data points after simplification.
@@ -45,14 +79,21 @@ def simplify_sensor_data_lttb(
         [d.time_utc.timestamp() for d in data]
     )  # Convert time_utc to timestamps
 
-    # Downsample the time values first
-    time_data = np.stack(
-        [times, times], axis=-1
-    )  # LTTB expects a 2-column array, so duplicate the x-axis
-    downsampled_time_data = downsample(time_data, target_points)
-    downsampled_times = downsampled_time_data[
-        :, 0
-    ]  # Extract the downsampled timestamps
+    fields = {
+        "temperature_1": np.array([d.temperature_1 for d in data]),
+        "temperature_2": np.array([d.temperature_2 for d in data]),
+        "temperature_3": np.array([d.temperature_3 for d in data]),
+        "temperature_average": np.array(
+            [d.temperature_average for d in data]
+        ),
+        "soil_moisture_count": np.array(
+            [d.soil_moisture_count for d in data]
+        ),
+    }
+
+    downsampled_times, downsampled = await run_in_process(
+        downsample_sensor_fields, times, fields, target_points
+    )
 
     # Helper to map downsampled times to original indices
     downsampled_set = set(downsampled_times)
@@ -62,27 +103,6 @@ def simplify_sensor_data_lttb(
         d for d in data if d.time_utc.timestamp() in downsampled_set
     ]
 
-    # Now, apply the LTTB algorithm for each y-axis variable separately
-    def downsample_field(field_data: np.ndarray) -> np.ndarray:
-        y_data = np.stack(
-            [times, field_data], axis=-1
-        )  # Combine the time and y-value
-        downsampled_y_data = downsample(y_data, target_points)
-        return downsampled_y_data[:, 1]  # Return only the downsampled y-values
-
-    # Apply downsampling for each of the fields
-    temp1 = np.array([d.temperature_1 for d in data])
-    temp2 = np.array([d.temperature_2 for d in data])
-    temp3 = np.array([d.temperature_3 for d in data])
-    temp_avg = np.array([d.temperature_average for d in data])
-    moisture = np.array([d.soil_moisture_count for d in data])
-
-    downsampled_temp1 = downsample_field(temp1)
-    downsampled_temp2 = downsample_field(temp2)
-    downsampled_temp3 = downsample_field(temp3)
-    downsampled_temp_avg = downsample_field(temp_avg)
-    downsampled_moisture = downsample_field(moisture)
-
     # Build the simplified data by updating the downsampled fields while preserving other fields
     simplified_data = []
     for i, d in enumerate(downsampled_original_data):
@@ -91,11 +111,11 @@ def simplify_sensor_data_lttb(
                 instrument_seq=d.instrument_seq,
                 time_utc=d.time_utc,  # Keep the downsampled time
                 time_zone=d.time_zone,
-                temperature_1=downsampled_temp1[i],
-                temperature_2=downsampled_temp2[i],
-                temperature_3=downsampled_temp3[i],
-                temperature_average=downsampled_temp_avg[i],
-                soil_moisture_count=downsampled_moisture[i],
+                temperature_1=downsampled["temperature_1"][i],
+                temperature_2=downsampled["temperature_2"][i],
+                temperature_3=downsampled["temperature_3"][i],
+                temperature_average=downsampled["temperature_average"][i],
+                soil_moisture_count=downsampled["soil_moisture_count"][i],
                 shake=d.shake,
                 error_flat=d.error_flat,
             )
@@ -133,9 +153,14 @@ async def get_data(
         range=range,
         filter=filter,
         session=session,
+        point_coordinates=True,
     )
 
-    return res
+    return validate_with_geometries(
+        SensorRead,
+        [row[0] for row in res],
+        geometries=point_geometries_from_rows(res),
+    )
 
 
 async def get_one(
@@ -153,7 +178,7 @@ async def get_one(
     res = SensorReadWithData.model_validate(res)
 
     if low_resolution:
-        res.data = simplify_sensor_data_lttb(res.data)
+        res.data = await simplify_sensor_data_lttb(res.data)
 
     return res
 
@@ -199,6 +224,7 @@ async def create_one(
     sensor_obj = Sensor.model_validate(sensor)
 
     session.add(sensor_obj)
+    await refresh_area_geometry(session, [sensor_obj.area_id])
     await session.commit()
     await session.refresh(sensor_obj)
 
@@ -228,8 +254,10 @@ async def update_one(
 
     update_data = sensor_update.model_dump(exclude_unset=True)
 
+    previous_area_id = sensor.area_id
     sensor.sqlmodel_update(update_data)
     session.add(sensor)
+    await refresh_area_geometry(session, [previous_area_id, sensor.area_id])
 
     if sensor_update.data_base64:
         # Decode Base64 CSV data and add it to SensorData table
@@ -2,6 +2,7 @@ from app.sensors.models import (
     SensorRead,
     SensorReadWithData,
     Sensor,
+    SensorData,
     SensorCreate,
     SensorUpdate,
 )
@@ -11,6 +12,7 @@ from sqlmodel import select
 from uuid import UUID
 from app.crud import CRUD
 from app.plots.models import Plot
+from app.areas.services import refresh_area_geometry
 from app.sensors.services import (
     get_count,
     get_data,
@@ -19,20 +21,41 @@ from app.sensors.services import (
     update_one,
     crud,
 )
+from app.areas.models import Area
+from app.utils.responses import (
+    CachedRoute,
+    FastJSONResponse,
+    model_response,
+)
 
-router = APIRouter()
+router = APIRouter(
+    route_class=CachedRoute, default_response_class=FastJSONResponse
+)
 
 
-@router.get("/{sensor_id}", response_model=SensorReadWithData)
+@router.get(
+    "/{sensor_id}",
+    response_model=SensorReadWithData,
+    dependencies=[
+        Depends(
+            crud.detail_etag(related=[Area], children=[SensorData.sensor_id])
+        )
+    ],
+)
 async def get_sensor(
+    response: Response,
     obj: CRUD = Depends(get_one),
 ) -> SensorRead:
     """Get a sensor by id"""
 
-    return obj
+    return model_response(obj, SensorReadWithData, response)
 
 
-@router.get("", response_model=list[SensorRead])
+@router.get(
+    "",
+    response_model=list[SensorRead],
+    dependencies=[Depends(crud.list_etag(related=[Area]))],
+)
 async def get_all_sensors(
     response: Response,
     sensors: CRUD = Depends(get_data),
@@ -68,11 +91,14 @@ async def delete_batch(
 ) -> list[str]:
     """Delete by a list of ids"""
 
+    area_ids = set()
     for id in ids:
         obj = await crud.get_model_by_id(model_id=id, session=session)
         if obj:
+            area_ids.add(obj.area_id)
             await session.delete(obj)
 
+    await refresh_area_geometry(session, area_ids)
     await session.commit()
 
     return [str(obj_id) for obj_id in ids]
@@ -86,6 +112,7 @@ async def delete_sensor(
     """Delete a sensor by id"""
 
     await session.delete(sensor)
+    await refresh_area_geometry(session, [sensor.area_id])
     await session.commit()
 
     return {"ok": True}
@@ -17,7 +17,6 @@ from sqlalchemy.sql import func
 from app.utils.validators import (
     convert_wkb_to_x_y,
     convert_x_y_to_wkt,
-    resize_images,
 )
 
 if TYPE_CHECKING:
@@ -167,7 +166,6 @@ class SoilProfileCreate(SoilProfileBase):
     name: str | None = None
 
     _convert_x_y_to_wkt = model_validator(mode="after")(convert_x_y_to_wkt)
-    _resize_images = model_validator(mode="after")(resize_images)
 
 
 class SoilProfileUpdate(SoilProfileBase):
@@ -178,4 +176,3 @@ class SoilProfileUpdate(SoilProfileBase):
     geom: Any | None = None
 
     _convert_x_y_to_wkt = model_validator(mode="after")(convert_x_y_to_wkt)
-    _resize_images = model_validator(mode="after")(resize_images)
@@ -9,11 +9,21 @@ from app.soil.profiles.models import (
 from app.db import get_session, AsyncSession
 from fastapi import Depends, APIRouter, Query, Response, HTTPException
 from uuid import UUID
+from typing import Any
 from app.crud import CRUD
+from app.utils.funcs import resize_base64_images
 from app.areas.models import Area
-from sqlmodel import select
+from app.areas.services import refresh_area_geometry
+from app.references.services import area_cache, soil_type_cache
+from app.exceptions import ValidationError
+from app.utils.validators import (
+    validate_with_geometries,
+    point_geometries_from_rows,
+)
+from app.utils.responses import CachedRoute
+from app.soil.types.models import SoilType
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 crud = CRUD(
     SoilProfile, SoilProfileReadWithArea, SoilProfileCreate, SoilProfileUpdate
 )
@@ -48,9 +58,14 @@ async def get_data(
         range=range,
         filter=filter,
         session=session,
+        point_coordinates=True,
     )
 
-    return res
+    return validate_with_geometries(
+        SoilProfileReadWithArea,
+        [row[0] for row in res],
+        geometries=point_geometries_from_rows(res),
+    )
 
 
 async def get_one(
@@ -66,7 +81,11 @@ async def get_one(
     return res
 
 
-@router.get("/{soil_profile_id}", response_model=SoilProfileReadWithArea)
+@router.get(
+    "/{soil_profile_id}",
+    response_model=SoilProfileReadWithArea,
+    dependencies=[Depends(crud.detail_etag(related=[Area, SoilType]))],
+)
 async def get_soil_profile(
     # session: AsyncSession = Depends(get_session),
     # *,
@@ -77,7 +96,11 @@ async def get_soil_profile(
     return obj
 
 
-@router.get("", response_model=list[SoilProfileReadWithArea])
+@router.get(
+    "",
+    response_model=list[SoilProfileReadWithArea],
+    dependencies=[Depends(crud.list_etag(related=[Area, SoilType]))],
+)
 async def get_all_soil_profiles(
     response: Response,
     soil_profiles: SoilProfile = Depends(get_data),
@@ -94,6 +117,31 @@ async def get_all_soil_profiles(
     return soil_profiles
 
 
+async def get_area(session: AsyncSession, data: dict) -> Any:
+    """Get the area of a soil profile and check that its soil type exists
+
+    Both are looked up in the reference cache.
+    """
+
+    area = await area_cache.get(session, data.get("area_id"))
+    if area is None:
+        raise ValidationError(
+            loc=["body", "area_id"],
+            msg=f"Area ID: {data.get('area_id')} not found",
+        )
+
+    if (
+        data.get("soil_type_id") is not None
+        and await soil_type_cache.get(session, data["soil_type_id"]) is None
+    ):
+        raise ValidationError(
+            loc=["body", "soil_type_id"],
+            msg=f"Soil type ID: {data['soil_type_id']} not found",
+        )
+
+    return area
+
+
 @router.post("", response_model=SoilProfileReadWithArea)
 async def create_soil_profile(
     soil_profile: SoilProfileCreate,
@@ -102,12 +150,10 @@ async def create_soil_profile(
     """Creates a soil profile data record"""
 
     profile = soil_profile.model_dump()
+    await resize_base64_images(profile, ["photo", "soil_diagram"])
 
     # Get area for the plot
-    res = await session.exec(
-        select(Area).where(Area.id == profile.get("area_id"))
-    )
-    area_obj = res.one()
+    area_obj = await get_area(session, profile)
 
     profile["name"] = (
         f"{area_obj.name.upper()[0]}"
@@ -117,6 +163,7 @@ async def create_soil_profile(
     obj = SoilProfile.model_validate(profile)
 
     session.add(obj)
+    await refresh_area_geometry(session, [obj.area_id])
 
     await session.commit()
     await session.refresh(obj)
@@ -134,12 +181,10 @@ async def update_soil_profile(
     """Update a soil profile by id"""
 
     update_data = soil_profile_update.model_dump(exclude_unset=True)
+    await resize_base64_images(update_data, ["photo", "soil_diagram"])
 
     # Get area for the profile
-    res = await session.exec(
-        select(Area).where(Area.id == update_data.get("area_id"))
-    )
-    area_obj = res.one()
+    area_obj = await get_area(session, update_data)
 
     update_data["name"] = (
         f"{area_obj.name.upper()[0]}"
@@ -147,9 +192,13 @@ async def update_soil_profile(
         f"{update_data['profile_iterator']:02d}"
     )
 
+    previous_area_id = soil_profile.area_id
     soil_profile.sqlmodel_update(update_data)
 
     session.add(soil_profile)
+    await refresh_area_geometry(
+        session, [previous_area_id, soil_profile.area_id]
+    )
     await session.commit()
     await session.refresh(soil_profile)
 
@@ -163,11 +212,14 @@ async def delete_batch(
 ) -> list[str]:
     """Delete by a list of ids"""
 
+    area_ids = set()
     for id in ids:
         obj = await crud.get_model_by_id(model_id=id, session=session)
         if obj:
+            area_ids.add(obj.area_id)
             await session.delete(obj)
 
+    await refresh_area_geometry(session, area_ids)
     await session.commit()
 
     return [str(obj_id) for obj_id in ids]
@@ -181,6 +233,7 @@ async def delete_soil_profile(
     """Delete a soil profile by id"""
 
     await session.delete(soil_profile)
+    await refresh_area_geometry(session, [soil_profile.area_id])
     await session.commit()
 
     return {"ok": True}
@@ -3,8 +3,6 @@ from uuid import UUID, uuid4
 from typing import TYPE_CHECKING
 import datetime
 from sqlalchemy.sql import func
-from pydantic import model_validator
-from app.utils.validators import resize_image
 
 if TYPE_CHECKING:
     from app.soil.profiles.models import SoilProfile
@@ -54,10 +52,6 @@ class SoilTypeRead(SoilTypeBase):
 class SoilTypeCreate(SoilTypeBase):
     pass
 
-    _resize_image = model_validator(mode="after")(resize_image)
-
 
 class SoilTypeUpdate(SoilTypeBase):
     pass
-
-    _resize_image = model_validator(mode="after")(resize_image)
@@ -9,8 +9,14 @@ from app.db import get_session, AsyncSession
 from fastapi import Depends, APIRouter, Query, Response, HTTPException
 from uuid import UUID
 from app.crud import CRUD
+from app.references.services import (
+    soil_type_cache,
+    invalidate_references,
+)
+from app.utils.funcs import resize_base64_images
+from app.utils.responses import CachedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 crud = CRUD(SoilType, SoilTypeRead, SoilTypeCreate, SoilTypeUpdate)
 
 
@@ -61,7 +67,11 @@ async def get_one(
     return res
 
 
-@router.get("/{soil_type_id}", response_model=SoilTypeRead)
+@router.get(
+    "/{soil_type_id}",
+    response_model=SoilTypeRead,
+    dependencies=[Depends(crud.detail_etag())],
+)
 async def get_soil_type(
     obj: CRUD = Depends(get_one),
 ) -> SoilTypeRead:
@@ -70,7 +80,11 @@ async def get_soil_type(
     return obj
 
 
-@router.get("", response_model=list[SoilTypeRead])
+@router.get(
+    "",
+    response_model=list[SoilTypeRead],
+    dependencies=[Depends(crud.list_etag())],
+)
 async def get_all_soil_types(
     response: Response,
     soil_types: CRUD = Depends(get_data),
@@ -88,10 +102,13 @@ async def create_soil_type(
 ) -> SoilTypeRead:
     """Creates a soil type data record"""
 
-    obj = SoilType.model_validate(soil_type)
+    data = await resize_base64_images(soil_type.model_dump(), ["image"])
+
+    obj = SoilType.model_validate(data)
 
     session.add(obj)
 
+    await invalidate_references(session, soil_type_cache)
     await session.commit()
     await session.refresh(obj)
 
@@ -108,9 +125,12 @@ async def update_soil_type(
     """Update a soil type by id"""
 
     update_data = soil_type_update.model_dump(exclude_unset=True)
+    await resize_base64_images(update_data, ["image"])
+
     soil_type.sqlmodel_update(update_data)
 
     session.add(soil_type)
+    await invalidate_references(session, soil_type_cache)
     await session.commit()
     await session.refresh(soil_type)
 
@@ -129,6 +149,7 @@ async def delete_batch(
         if obj:
             await session.delete(obj)
 
+    await invalidate_references(session, soil_type_cache)
     await session.commit()
 
     return [str(obj_id) for obj_id in ids]
@@ -142,6 +163,7 @@ async def delete_soil_type(
     """Delete a soil type by id"""
 
     await session.delete(soil_type)
+    await invalidate_references(session, soil_type_cache)
     await session.commit()
 
     return {"ok": True}
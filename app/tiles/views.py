@@ -0,0 +1,209 @@
+from app.db import get_session, AsyncSession
+from app.areas.models import Area
+from app.plots.models import Plot
+from app.sensors.models import Sensor
+from app.soil.profiles.models import SoilProfile
+from app.utils.cache import LRUCache
+from app.utils.projection import WGS84_SRID, transform_coordinates
+from app.utils.responses import etag_matches, weak_etag
+from app.config import config
+from fastapi import Depends, APIRouter, Header, Path, Response, HTTPException
+from sqlalchemy import select, cast, String
+from sqlalchemy.sql import func
+from typing import Any
+import functools
+import numpy as np
+import pyproj
+
+router = APIRouter()
+
+WEB_MERCATOR_SRID = 3857
+WEB_MERCATOR_EXTENT = 20037508.342789244  # Half the width of the world (m)
+TILE_ENVELOPE_SEGMENTS = 64  # Points per side of the transformed envelope
+
+# Model and the attributes included in each feature for each layer
+LAYERS: dict[str, tuple[Any, list[Any]]] = {
+    "plots": (Plot, [Plot.name, Plot.area_id, Plot.gradient]),
+    "sensors": (Sensor, [Sensor.name, Sensor.area_id]),
+    "soil_profiles": (SoilProfile, [SoilProfile.name, SoilProfile.area_id]),
+    "areas": (Area, [Area.name, Area.project_id]),
+}
+
+tile_cache: LRUCache[tuple[str, int, int, int, str], bytes] = LRUCache(
+    max_entries=config.TILE_CACHE_MAX_ENTRIES,
+    max_bytes=config.TILE_CACHE_MAX_BYTES,
+    sizeof=len,
+)
+layer_versions: dict[str, str] = {}  # Version of the layers in the cache
+
+# Layer versions are reused for TILE_VERSION_TTL seconds, so the tiles of a
+# map view requested together share one scan of the layer table
+layer_version_cache: LRUCache[str, str] = LRUCache(
+    max_entries=len(LAYERS), ttl=config.TILE_VERSION_TTL
+)
+
+
+async def get_layer_version(session: AsyncSession, layer: str) -> str:
+    """Version of a layer's data, changes whenever a row is added, updated
+    or removed
+    """
+
+    if config.TILE_VERSION_TTL:
+        version = layer_version_cache.get(layer)
+        if version is not None:
+            return version
+
+    model, _ = LAYERS[layer]
+    res = await session.exec(
+        select(func.count(model.id), func.max(model.last_updated))
+    )
+    count, last_updated = res.one()
+
+    version = f"{count}-{last_updated.isoformat() if last_updated else ''}"
+    if config.TILE_VERSION_TTL:
+        layer_version_cache.set(layer, version)
+
+    return version
+
+
+@functools.cache
+def get_area_of_use(srid: int) -> tuple[float, float, float, float]:
+    """Bounds (xmin, ymin, xmax, ymax) in Web Mercator of the area of use of
+    an SRID, clamped to the extent of Web Mercator
+    """
+
+    west, south, east, north = pyproj.CRS.from_epsg(srid).area_of_use.bounds
+    if west > east:  # Crosses the antimeridian
+        west, east = -180.0, 180.0
+
+    x, y = transform_coordinates(
+        [west, east], [south, north], src=WGS84_SRID, dst=WEB_MERCATOR_SRID
+    )
+    x = np.clip(x, -WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT)
+    y = np.clip(y, -WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT)
+
+    return float(x[0]), float(y[0]), float(x[1]), float(y[1])
+
+
+def get_tile_bounds(
+    z: int, x: int, y: int
+) -> tuple[float, float, float, float]:
+    """Bounds (xmin, ymin, xmax, ymax) of a tile in Web Mercator, as given
+    by ST_TileEnvelope
+    """
+
+    size = 2 * WEB_MERCATOR_EXTENT / 2**z
+    xmin = -WEB_MERCATOR_EXTENT + x * size
+    ymax = WEB_MERCATOR_EXTENT - y * size
+
+    return xmin, ymax - size, xmin + size, ymax
+
+
+async def get_tile(
+    session: AsyncSession,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+) -> bytes:
+    """Build a Mapbox Vector Tile of a layer with ST_AsMVT
+
+    Only features intersecting the tile are read, using the GiST index on
+    the geometry column. The envelope is densified before being transformed
+    to the SRID of the layer, transforming only its corners gives a box that
+    misses most of the tile at low zooms. It is first clipped to the area of
+    use of the SRID, outside of which the transformed coordinates fold over
+    or are invalid, and tiles outside of it are empty.
+    """
+
+    model, attributes = LAYERS[layer]
+    srid = model.geom.type.srid
+    envelope = func.ST_TileEnvelope(z, x, y)
+
+    tile_xmin, tile_ymin, tile_xmax, tile_ymax = get_tile_bounds(z, x, y)
+    use_xmin, use_ymin, use_xmax, use_ymax = get_area_of_use(srid)
+    xmin, ymin = max(tile_xmin, use_xmin), max(tile_ymin, use_ymin)
+    xmax, ymax = min(tile_xmax, use_xmax), min(tile_ymax, use_ymax)
+    if xmin >= xmax or ymin >= ymax:
+        return b""
+
+    clipped = func.ST_MakeEnvelope(xmin, ymin, xmax, ymax, WEB_MERCATOR_SRID)
+    segment_length = max(xmax - xmin, ymax - ymin) / TILE_ENVELOPE_SEGMENTS
+
+    features = (
+        select(
+            func.ST_AsMVTGeom(
+                func.ST_Transform(model.geom, WEB_MERCATOR_SRID), envelope
+            ).label("geom"),
+            cast(model.id, String).label("id"),
+            *[
+                cast(attribute, String).label(attribute.key)
+                for attribute in attributes
+            ],
+        )
+        .where(
+            model.geom.op("&&")(
+                func.ST_Transform(
+                    func.ST_Segmentize(clipped, segment_length), srid
+                )
+            )
+        )
+        .subquery("features")
+    )
+
+    res = await session.exec(
+        select(func.ST_AsMVT(features.table_valued(), layer, 4096, "geom"))
+    )
+
+    return bytes(res.scalar_one() or b"")
+
+
+@router.get("/{layer}/{z}/{x}/{y}.mvt")
+async def get_vector_tile(
+    layer: str,
+    z: int = Path(ge=0, le=24),
+    x: int = Path(ge=0),
+    y: int = Path(ge=0),
+    if_none_match: str | None = Header(None),
+    session: AsyncSession = Depends(get_session),
+) -> Response:
+    """Get a Mapbox Vector Tile of plots, sensors, soil profiles or areas
+
+    Tiles are cached per layer version, the ETag allows clients to revalidate
+    a tile without downloading it again.
+    """
+
+    if layer not in LAYERS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Layer: {layer} not found, use one of {list(LAYERS)}",
+        )
+    if x >= 2**z or y >= 2**z:
+        raise HTTPException(
+            status_code=404, detail=f"Tile: {z}/{x}/{y} not found"
+        )
+
+    version = await get_layer_version(session, layer)
+    # Weak, the body may be compressed by CompressionMiddleware
+    etag = weak_etag(layer, z, x, y, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    if layer_versions.get(layer) != version:
+        # Tiles of older versions of the layer will not be requested again
+        tile_cache.invalidate(lambda key: key[0] == layer)
+        layer_versions[layer] = version
+
+    key = (layer, z, x, y, version)
+    tile = tile_cache.get(key)
+    if tile is None:
+        tile = await get_tile(session, layer, z, x, y)
+        tile_cache.set(key, tile)
+
+    return Response(
+        content=tile,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers=headers,
+    )
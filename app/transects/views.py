@@ -12,6 +12,7 @@ from typing import Any
 from app.crud import CRUD
 from app.plots.models import Plot
 from app.transects.models.nodes import TransectNode
+from app.utils.validators import validate_with_geometries
 
 router = APIRouter()
 crud = CRUD(Transect, TransectRead, TransectCreate, TransectUpdate)
@@ -48,7 +49,11 @@ async def get_data(
         session=session,
     )
 
-    return res
+    return validate_with_geometries(
+        TransectRead,
+        res,
+        [node.geom for transect in res for node in transect.nodes],
+    )
 
 
 async def get_one(
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+import hashlib
+import time
+import numpy as np
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """An in-process least recently used cache bounded by entries and size
+
+    `sizeof` returns the size in bytes of a value, when given together with
+    `max_bytes` the least recently used entries are evicted until the total
+    size fits. Values larger than `max_bytes` are not cached at all. With
+    `ttl` (seconds), entries expire that long after being set.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+        ttl: float | None = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+
+        # Value, size and expiry time (monotonic) of each key
+        self._entries: OrderedDict[K, tuple[V, int, float | None]] = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        entry = self._entries.get(key)
+
+        return entry is not None and (
+            entry[2] is None or entry[2] > time.monotonic()
+        )
+
+    def get(self, key: K) -> V | None:
+        """Get a value and mark it as the most recently used"""
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] is not None:
+            if entry[2] <= time.monotonic():
+                self.pop(key)
+                entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return entry[0]
+
+    def set(self, key: K, value: V) -> None:
+        """Add or replace a value, evicting the least recently used"""
+
+        self.pop(key)
+
+        size = self.sizeof(value) if self.sizeof else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[key] = (value, size, expires)
+        self.total_bytes += size
+
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        ):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def pop(self, key: K) -> V | None:
+        """Remove a value, returning it if it was cached"""
+
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+
+        self.total_bytes -= entry[1]
+
+        return entry[0]
+
+    def invalidate(self, predicate: Callable[[K], bool]) -> int:
+        """Remove all entries whose key matches the predicate"""
+
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self.pop(key)
+
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.total_bytes = 0
+
+
+def array_digest(*arrays: np.ndarray) -> str:
+    """Hash the content of NumPy arrays to use as (part of) a cache key"""
+
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+
+    return digest.hexdigest()
@@ -0,0 +1,210 @@
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.compute import run_in_thread
+from app.config import config
+from typing import Any
+import zlib
+
+try:
+    import brotli
+except ImportError:  # A project dependency, gzip is still offered without
+    brotli = None
+
+# Supported content encodings, in order of preference
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/geo+json",
+    "application/vnd.mapbox-vector-tile",
+)
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Choose the preferred encoding accepted by the client, if any
+
+    Encodings with a quality of 0 are refused, `*` accepts the others.
+    """
+
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    candidates = [
+        encoding
+        for encoding in ENCODINGS
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+
+    return max(
+        candidates,
+        key=lambda encoding: accepted.get(encoding, accepted.get("*", 0.0)),
+    )
+
+
+def is_compressible(headers: Headers) -> bool:
+    """Whether a response is worth compressing, by its content type"""
+
+    return "content-encoding" not in headers and headers.get(
+        "content-type", ""
+    ).startswith(COMPRESSIBLE_TYPES)
+
+
+def compressor(encoding: str) -> Any:
+    """A streaming compressor (with compress and flush) for an encoding"""
+
+    if encoding == "br":
+        return _BrotliCompressor(
+            brotli.Compressor(quality=config.COMPRESSION_BROTLI_QUALITY)
+        )
+
+    # wbits=31 writes the gzip header and trailer
+    return zlib.compressobj(config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+class _BrotliCompressor:
+    """brotli.Compressor with the compress and flush methods of zlib"""
+
+    def __init__(self, compressor: Any):
+        self._compressor = compressor
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a whole body with an encoding"""
+
+    if encoding == "br":
+        return brotli.compress(body, quality=config.COMPRESSION_BROTLI_QUALITY)
+
+    obj = compressor(encoding)
+
+    return obj.compress(body) + obj.flush()
+
+
+async def compress_async(body: bytes, encoding: str) -> bytes:
+    """Compress a body, in the thread pool when it is large
+
+    zlib and brotli release the GIL, so large bodies are compressed in the
+    compute thread pool instead of blocking the event loop. If the pool is
+    saturated the body is compressed on the event loop rather than failing
+    the response.
+    """
+
+    if len(body) >= config.COMPRESSION_THREAD_MIN_SIZE:
+        try:
+            return await run_in_thread(compress, body, encoding)
+        except HTTPException:
+            pass
+
+    return compress(body, encoding)
+
+
+def add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """Compress responses with the encoding negotiated with Accept-Encoding
+
+    Bodies of compressible content types of at least COMPRESSION_MIN_SIZE
+    bytes are compressed with brotli or gzip. Streamed
+    responses (CSV exports) are compressed chunk by chunk. Responses that
+    already have a Content-Encoding, such as the compressed variants served
+    from the response cache, are sent as they are.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding")
+        )
+        start: Message | None = None
+        stream = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, stream, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if not is_compressible(headers):
+                    passthrough = True
+                    await send(message)
+                    return
+                add_vary(MutableHeaders(scope=message))
+                if encoding is None:
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message  # Sent with the first body
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                headers = MutableHeaders(scope=start)
+                if not more_body:
+                    # Whole body at once
+                    if len(body) >= config.COMPRESSION_MIN_SIZE:
+                        body = await compress_async(body, encoding)
+                        headers["Content-Encoding"] = encoding
+                        headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    start = None
+                    await send({**message, "body": body})
+                    return
+
+                # Streamed, the length is not known
+                stream = compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                del headers["Content-Length"]
+                await send(start)
+                start = None
+
+            if stream is None:
+                await send(message)
+                return
+
+            body = stream.compress(body)
+            if not more_body:
+                body += stream.flush()
+            elif not body:
+                return  # Buffered by the compressor
+
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
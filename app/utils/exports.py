@@ -0,0 +1,65 @@
+from fastapi.responses import StreamingResponse
+from typing import Iterable, Iterator
+from app.config import config
+import numpy as np
+import csv
+import io
+import re
+
+
+def format_csv_row(row: Iterable) -> str:
+    """Format a single row as a CSV line, quoting values where needed"""
+
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(row)
+
+    return buffer.getvalue()
+
+
+def iter_csv_rows(rows: Iterable[Iterable]) -> Iterator[str]:
+    """Yield each row of a small table as a CSV line"""
+
+    for row in rows:
+        yield format_csv_row(row)
+
+
+def iter_csv_columns(
+    header: list[str],
+    columns: list[np.ndarray],
+    block_size: int = config.CSV_EXPORT_BLOCK_SIZE,
+) -> Iterator[str]:
+    """Yield CSV text for numeric columns, one block of rows at a time
+
+    Columns may differ in length, the missing values of the shorter columns
+    are left empty (as are NaN values). Only one block of rows is formatted
+    at a time so large exports do not build the whole table in memory.
+    """
+
+    yield format_csv_row(header)
+
+    n_rows = max((len(column) for column in columns), default=0)
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+
+        block = np.full((stop - start, len(columns)), np.nan)
+        for i, column in enumerate(columns):
+            values = column[start:stop]
+            block[: len(values), i] = values
+
+        # NumPy formats floats with the shortest round-trip representation
+        text = block.astype(str)
+        text[np.isnan(block)] = ""
+
+        yield "".join(",".join(row) + "\n" for row in text.tolist())
+
+
+def csv_response(content: Iterator[str], filename: str) -> StreamingResponse:
+    """Stream CSV content as a file download"""
+
+    filename = re.sub(r"[^\w.-]+", "_", filename)
+
+    return StreamingResponse(
+        content,
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -2,15 +2,9 @@ from fastapi import HTTPException
 import base64
 import io
 from PIL import Image
-import httpx
-import tenacity
-from typing import Any
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.crud import CRUD
-from uuid import UUID
-import shapely
-from geoalchemy2 import Geometry, WKBElement
-from shapely.geometry import shape, mapping
+from app.compute import run_in_process
+from app.config import config
+from app.exceptions import ValidationError
 
 
 def decode_base64(value: str) -> tuple[bytes, str]:
@@ -62,58 +56,21 @@ def resize_base64_image(data: str, max_size: int) -> str:
     return img_str
 
 
-@tenacity.retry
-async def get_elevation_swisstopo(
-    x: float,
-    y: float,
-    srid: int = 2056,
-) -> float:
-    """Get the elevation from the Swiss API"""
+async def resize_base64_images(data: dict, fields: list[str]) -> dict:
+    """Resize the base64 images in the given fields of the data in place
 
-    url = (
-        f"https://api3.geo.admin.ch/rest/services/height"
-        f"?easting={x}&northing={y}&sr={srid}&format=json"
-        f"&geometryFormat=geojson"
-    )
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        data = response.json()
-
-    if not data.get("height"):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Error fetching elevation: {data}",
-        )
-
-    return data["height"]
-
-
-async def set_elevation_to_db_obj(
-    id: UUID,
-    crud_instance: CRUD,
-    session: AsyncSession,
-) -> None:
-    """With the given id, fetch the object from the database and set the
-    elevation
-
-    Retry and wait until the elevation is fetched from the Swiss API
-
-    The read and update models are given to return the object with the
-    elevation unwrapped from the geom field
+    The decoding and resizing is done in the compute process pool so large
+    images do not block the event loop.
     """
 
-    obj = await crud_instance.get_model_by_id(model_id=id, session=session)
-
-    # Unwrap the geom wkb field, get the elevation and set it to the object
-    geom = shapely.wkb.loads(bytes(obj.geom.data))
-    x, y = geom.centroid.x, geom.centroid.y
-    z = await get_elevation_swisstopo(x, y)
-
-    obj.geom = shapely.wkt.dumps(shapely.geometry.Point(x, y, z))
-
-    session.add(obj)
-    await session.commit()
-    await session.refresh(obj)
-
-    return obj
+    for field in fields:
+        if data.get(field) is None:
+            continue
+        try:
+            data[field] = await run_in_process(
+                resize_base64_image, data[field], config.IMAGE_MAX_SIZE
+            )
+        except ValueError as e:
+            raise ValidationError(loc=["body", field], msg=str(e))
+
+    return data
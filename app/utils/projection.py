@@ -0,0 +1,52 @@
+from numpy.typing import ArrayLike
+from app.config import config
+import numpy as np
+import pyproj
+import threading
+
+WGS84_SRID = 4326
+
+# Transformers of each thread by (src, dst), dropped when the thread exits
+_transformers = threading.local()
+
+
+def get_transformer(src: int, dst: int) -> pyproj.Transformer:
+    """Get a cached transformer from the src to the dst SRID
+
+    Building a transformer takes milliseconds, so they are built once per
+    process (and per thread, as transformers are not thread-safe) and reused.
+    Coordinates are always in x/y (lon/lat) order.
+    """
+
+    transformers = getattr(_transformers, "by_srid", None)
+    if transformers is None:
+        transformers = _transformers.by_srid = {}
+
+    if (src, dst) not in transformers:
+        transformers[(src, dst)] = pyproj.Transformer.from_crs(
+            f"EPSG:{src}", f"EPSG:{dst}", always_xy=True
+        )
+
+    return transformers[(src, dst)]
+
+
+def transform_coordinates(
+    x: ArrayLike,
+    y: ArrayLike,
+    z: ArrayLike | None = None,
+    src: int = config.SRID,
+    dst: int = WGS84_SRID,
+) -> tuple[np.ndarray, ...]:
+    """Transform arrays of coordinates in one vectorised call
+
+    Returns the transformed (x, y) arrays, or (x, y, z) if z is given.
+    """
+
+    transformer = get_transformer(src, dst)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    if z is None:
+        return transformer.transform(x, y)
+
+    return transformer.transform(x, y, np.asarray(z, dtype=float))
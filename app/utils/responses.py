@@ -0,0 +1,257 @@
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from app.utils.cache import LRUCache
+from app.utils.compression import (
+    ENCODINGS,
+    compress_async,
+    is_compressible,
+    negotiate_encoding,
+)
+from app.config import config
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from typing import Any, Callable, NamedTuple, get_args, get_origin
+import functools
+import hashlib
+import numpy as np
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    status_code: int
+    headers: dict[str, str]  # Without Content-Length
+    media_type: str | None
+    encoded: dict[str, bytes]  # Compressed bodies by content encoding
+
+    def to_response(self, encoding: str | None = None) -> Response:
+        """The response, compressed with the encoding if it is stored"""
+
+        headers = dict(self.headers)
+        body = self.body
+        if encoding in self.encoded:
+            headers["Content-Encoding"] = encoding
+            body = self.encoded[encoding]
+
+        return Response(
+            content=body,
+            status_code=self.status_code,
+            headers=headers,
+            media_type=self.media_type,
+        )
+
+
+# Responses by URL and ETag, only used when RESPONSE_CACHE_TTL is set
+response_cache: LRUCache[tuple[str, str], CachedResponse] = LRUCache(
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+    sizeof=lambda response: len(response.body)
+    + sum(len(body) for body in response.encoded.values()),
+    ttl=config.RESPONSE_CACHE_TTL,
+)
+
+
+class ServeCached(Exception):
+    """Raised by a dependency to answer with a cached response"""
+
+    def __init__(self, response: Response):
+        self.response = response
+
+
+def weak_etag(*parts: Any) -> str:
+    """A weak ETag (W/"...") from the hash of the given version parts"""
+
+    digest = hashlib.blake2b(
+        "/".join(str(part) for part in parts).encode(), digest_size=16
+    )
+
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    """Weak comparison of an ETag with an If-None-Match header"""
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+
+    return opaque in [
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    ]
+
+
+def check_etag(request: Request, response: Response, etag: str) -> None:
+    """Answer a conditional request before the response is built
+
+    Sets the ETag of the response. If the client already has it (the ETag
+    is in If-None-Match), a 304 Not Modified is raised. Otherwise, when the
+    response cache is enabled, a cached response of the URL with the same
+    ETag is served, or the response is stored by CachedRoute once built.
+    """
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    response.headers.update(headers)
+
+    if etag_matches(etag, request.headers.get("if-none-match")):
+        raise HTTPException(status_code=304, headers=headers)
+
+    if config.RESPONSE_CACHE_TTL:
+        key = (str(request.url), etag)
+        cached = response_cache.get(key)
+        if cached is not None:
+            raise ServeCached(
+                cached.to_response(
+                    negotiate_encoding(request.headers.get("accept-encoding"))
+                )
+            )
+        request.state.response_cache_key = key
+
+
+async def cache_response(
+    key: tuple[str, str],
+    response: Response,
+) -> CachedResponse:
+    """Store a response, together with its compressed variants
+
+    Compressible bodies of at least COMPRESSION_MIN_SIZE bytes are stored
+    compressed with every supported encoding, so that the cached response
+    is neither serialised nor compressed again.
+    """
+
+    body = bytes(response.body)
+    encoded = {}
+    if is_compressible(response.headers) and (
+        len(body) >= config.COMPRESSION_MIN_SIZE
+    ):
+        for encoding in ENCODINGS:
+            encoded[encoding] = await compress_async(body, encoding)
+
+    headers = dict(response.headers)
+    headers.pop("content-length", None)
+    if encoded:
+        headers["vary"] = ", ".join(
+            filter(None, [headers.get("vary"), "Accept-Encoding"])
+        )
+
+    cached = CachedResponse(
+        body=body,
+        status_code=response.status_code,
+        headers=headers,
+        media_type=response.media_type,
+        encoded=encoded,
+    )
+    response_cache.set(key, cached)
+
+    return cached
+
+
+class CachedRoute(APIRoute):
+    """Route serving and storing the responses cached by check_etag"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            try:
+                response = await handler(request)
+            except ServeCached as e:
+                return e.response
+
+            key = getattr(request.state, "response_cache_key", None)
+            if key is not None and response.status_code == 200:
+                cached = await cache_response(key, response)
+
+                # Send the stored compressed body instead of compressing the
+                # response again in the middleware
+                encoding = negotiate_encoding(
+                    request.headers.get("accept-encoding")
+                )
+                if encoding in cached.encoded:
+                    compressed = cached.to_response(encoding)
+                    compressed.background = response.background
+                    return compressed
+
+            return response
+
+        return route_handler
+
+
+def numpy_fallback(obj: Any) -> Any:
+    """Serialise NumPy arrays and scalars, the fallback of the JSON encoder"""
+
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+
+    raise TypeError(
+        f"Object of type {type(obj).__name__} is not JSON serializable"
+    )
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialised by pydantic-core instead of json.dumps
+
+    Pydantic models are dumped by their core serializer and NumPy arrays and
+    scalars through numpy_fallback. NaN and infinite floats become null.
+    Content that is already serialised (bytes) is sent as is.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+
+        return to_json(content, fallback=numpy_fallback, inf_nan_mode="null")
+
+
+@functools.cache
+def get_adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def is_instance(content: Any, model: Any) -> bool:
+    """Whether content is an instance of a model or of list[model]"""
+
+    if get_origin(model) is list:
+        (item_model,) = get_args(model)
+        return isinstance(content, list) and all(
+            isinstance(item, item_model) for item in content
+        )
+
+    return isinstance(model, type) and isinstance(content, model)
+
+
+def model_response(
+    content: Any,
+    model: Any,
+    response: Response | None = None,
+    **kwargs: Any,
+) -> Response:
+    """Serialise content as the response model of a route
+
+    FastAPI validates everything a route returns against its response
+    model, then serialises it. Returning this response instead skips the
+    validation of content that is already an instance of the model (or a
+    list of instances), other content (ORM objects) is validated once. The
+    response_model of the route is still used for the documentation.
+
+    FastAPI does not copy the headers set on the `response` parameter of a
+    route (ie. the ETag of check_etag) to a returned response, pass it to
+    keep them.
+    """
+
+    adapter = get_adapter(model)
+    if not is_instance(content, model):
+        content = adapter.validate_python(content, from_attributes=True)
+
+    json_response = FastJSONResponse(
+        adapter.serializer.to_json(content, fallback=numpy_fallback),
+        **kwargs,
+    )
+    if response is not None:
+        for name, value in response.headers.items():
+            if name != "content-length":
+                json_response.headers[name] = value
+
+    return json_response
@@ -1,50 +1,155 @@
 import shapely
 from geoalchemy2.elements import WKBElement
-import pyproj
 from app.config import config
-from app.utils.funcs import resize_base64_image
-from typing import Any
+from app.utils.projection import (
+    get_transformer,
+    transform_coordinates,
+    WGS84_SRID,
+)
+from pydantic import ValidationInfo
+from sqlmodel import SQLModel
+from typing import Any, Iterable
+import numpy as np
+
+
+def decode_point_geometries(geoms: Iterable[Any]) -> dict[str, dict]:
+    """Decode WKB point geometries in bulk
+
+    All geometries are parsed in one vectorised shapely call and reprojected
+    to WGS84 in one pyproj call. Returns the point fields (GeoJSON geom,
+    coord_x/y/z, coord_srid, latitude, longitude) keyed by the hex WKB string
+    so validators can look them up with `str(values.geom)`.
+    """
+
+    elements = {
+        str(geom): geom for geom in geoms if isinstance(geom, WKBElement)
+    }
+    if not elements:
+        return {}
+
+    keys = list(elements)
+    shapes = shapely.from_wkb(np.array(keys, dtype=object))
+    coords, index = shapely.get_coordinates(
+        shapes, include_z=True, return_index=True
+    )
+
+    # Take the first coordinate of each geometry, empty ones have none
+    index, first = np.unique(index, return_index=True)
+    coords = coords[first]
+    longitudes, latitudes = transform_coordinates(
+        coords[:, 0], coords[:, 1], src=config.SRID, dst=WGS84_SRID
+    )
+
+    points = {}
+    for i, (x, y, z), longitude, latitude in zip(
+        index.tolist(), coords.tolist(), longitudes.tolist(), latitudes.tolist()
+    ):
+        z = None if np.isnan(z) else z
+        points[keys[i]] = {
+            "geom": {
+                "type": "Point",
+                "coordinates": (x, y) if z is None else (x, y, z),
+            },
+            "coord_x": x,
+            "coord_y": y,
+            "coord_z": z,
+            "coord_srid": elements[keys[i]].srid,
+            "latitude": latitude,
+            "longitude": longitude,
+        }
+
+    return points
+
+
+def point_geometries_from_rows(rows: Iterable[Any]) -> dict[str, dict]:
+    """Build the point fields from coordinates already selected in SQL
+
+    Takes the rows of `CRUD.get_model_data(point_coordinates=True)`, the
+    object followed by its coord_x/y/z, longitude and latitude, and returns
+    the same lookup as `decode_point_geometries` without parsing any WKB.
+    """
+
+    points = {}
+    for obj, x, y, z, longitude, latitude in rows:
+        if not isinstance(obj.geom, WKBElement) or x is None or y is None:
+            continue
+
+        points[str(obj.geom)] = {
+            "geom": {
+                "type": "Point",
+                "coordinates": (x, y) if z is None else (x, y, z),
+            },
+            "coord_x": x,
+            "coord_y": y,
+            "coord_z": z,
+            "coord_srid": obj.geom.srid,
+            "latitude": latitude,
+            "longitude": longitude,
+        }
+
+    return points
+
+
+def validate_with_geometries(
+    model: type[SQLModel],
+    objs: Iterable[Any],
+    geoms: Iterable[Any] | None = None,
+    geometries: dict[str, dict] | None = None,
+) -> list[Any]:
+    """Validate a page of objects, decoding their point geometries in bulk
+
+    `geoms` are all the WKB geometries in the page, including those of any
+    nested objects, and default to the `geom` of each object. Alternatively
+    `geometries` gives the already decoded points. They are passed to the
+    `convert_wkb_to_x_y` validators through the validation context.
+    """
+
+    objs = list(objs)
+    if geometries is None:
+        if geoms is None:
+            geoms = [obj.geom for obj in objs]
+        geometries = decode_point_geometries(geoms)
+
+    context = {"geometries": geometries}
+
+    return [model.model_validate(obj, context=context) for obj in objs]
 
 
 def convert_wkb_to_x_y(
     cls,
     values: Any,
+    info: ValidationInfo,
 ) -> dict:
-    """Form the geometry from the X and Y coordinates"""
+    """Form the geometry from the X and Y coordinates
+
+    Geometries decoded in bulk by `validate_with_geometries` are taken from
+    the validation context, others are decoded here one at a time.
+    """
 
     if isinstance(values.geom, WKBElement):
-        if values.geom is not None:
-            shapely_obj = shapely.wkb.loads(str(values.geom))
-            if shapely_obj is not None:
-                mapping = shapely.geometry.mapping(shapely_obj)
-                values.coord_srid = values.geom.srid
-                values.coord_x = mapping["coordinates"][0]
-                values.coord_y = mapping["coordinates"][1]
-                values.coord_z = mapping["coordinates"][2]
-                values.geom = mapping
-
-                # Set the latitude and longitude by reprojecting to WGS84
-                transformer = pyproj.Transformer.from_crs(
-                    f"EPSG:{str(config.SRID)}", "EPSG:4326", always_xy=True
-                )
-                values.longitude, values.latitude, _ = transformer.transform(
-                    values.coord_x, values.coord_y, values.coord_z
-                )
+        key = str(values.geom)
+        geometries = (info.context or {}).get("geometries")
+        if geometries is None or key not in geometries:
+            geometries = decode_point_geometries([values.geom])
+
+        point = geometries.get(key)
+        if point is not None:
+            for field, value in point.items():
+                setattr(values, field, value)
 
     elif isinstance(values.geom, dict):
         if values.geom is not None:
             values.coord_x = values.geom["coordinates"][0]
             values.coord_y = values.geom["coordinates"][1]
             values.coord_z = values.geom["coordinates"][2]
-            values.geom = values.geom
 
-            # Set the latitude and longitude by reprojecting to WGS84
-            transformer = pyproj.Transformer.from_crs(
-                f"EPSG:{str(config.SRID)}", "EPSG:4326", always_xy=True
-            )
-            values.longitude, values.latitude, _ = transformer.transform(
-                values.coord_x, values.coord_y, values.coord_z
-            )
+            # Set the latitude and longitude by reprojecting to WGS84, unless
+            # they are already set (when revalidating a decoded object)
+            if values.latitude is None or values.longitude is None:
+                transformer = get_transformer(config.SRID, WGS84_SRID)
+                values.longitude, values.latitude, _ = transformer.transform(
+                    values.coord_x, values.coord_y, values.coord_z
+                )
 
     else:
         values.coord_x = None
@@ -65,15 +170,6 @@ def convert_x_y_to_wkt(cls, values: Any) -> Any:
     return values
 
 
-def resize_image(cls, values: Any) -> Any:
-    """Resize the image"""
-
-    if values.image is not None:
-        values.image = resize_base64_image(values.image, config.IMAGE_MAX_SIZE)
-
-    return values
-
-
 def empty_string_to_none(cls, values):
     """Convert empty strings for float and datetime fields to None."""
 
@@ -83,20 +179,6 @@ def empty_string_to_none(cls, values):
     return values
 
 
-def resize_images(cls, values: Any) -> Any:
-    """Resize the images"""
-
-    if values.photo is not None:
-        values.photo = resize_base64_image(values.photo, config.IMAGE_MAX_SIZE)
-
-    if values.soil_diagram is not None:
-        values.soil_diagram = resize_base64_image(
-            values.soil_diagram, config.IMAGE_MAX_SIZE
-        )
-
-    return values
-
-
 def convert_wkb_to_json(cls, values: Any) -> Any:
     """Convert the WKBElement to a shapely mapping"""
 
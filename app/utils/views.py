@@ -1,14 +1,25 @@
 from fastapi import Depends, APIRouter, Query, HTTPException
 from sqlmodel import select
 from app.db import get_session, AsyncSession
-from sqlalchemy import func
-from sqlmodel import SQLModel, Field
+from sqlalchemy import func, values, column, true, Integer, Float
+from sqlmodel import SQLModel, Field, Column
 from geoalchemy2 import Geometry
-from typing import Optional
-from app.utils.funcs import get_elevation_swisstopo
+from typing import Any, Optional
+from app.utils.cache import LRUCache
+from app.config import config
+from app.elevation import services as elevation
+from app.elevation.models import (
+    Elevation,
+    ElevationPointCreate,
+    ElevationPointRead,
+)
+from app.compute import TaskMetrics, get_metrics
+import numpy as np
 
 router = APIRouter()
 
+SLOPE_SRID = 2056  # SRID of the slope class polygons
+
 
 class HLAllgmeinZusammenfassungMerged(SQLModel, table=True):
     __tablename__ = "hlallgmein_zusammenfassung_merged"
@@ -21,13 +32,96 @@ class HLAllgmeinZusammenfassungMerged(SQLModel, table=True):
     hl_neigung_hang: Optional[str] = Field(default=None, max_length=512)
     shape_length: Optional[float] = None
     shape_area: Optional[float] = None
-    shape: Optional[str] = Field(sa_column=Geometry("MULTIPOLYGON", 2056))
+    shape: Optional[Any] = Field(
+        default=None,
+        sa_column=Column(
+            Geometry("MULTIPOLYGON", SLOPE_SRID, spatial_index=False)
+        ),
+    )
 
 
 class Slope(SQLModel):
     slope_class: str
 
 
+class SlopePointCreate(SQLModel):
+    x: float
+    y: float
+
+
+class SlopePointRead(SlopePointCreate):
+    slope_class: str | None = None  # None outside of the slope data
+
+
+# Slope class of recently requested points, by (srid, x, y)
+slope_cache: LRUCache[tuple[int, float, float], str | None] = LRUCache(
+    max_entries=config.SLOPE_CACHE_MAX_ENTRIES
+)
+
+
+async def get_slope_classes(
+    session: AsyncSession,
+    points: list[tuple[float, float]],
+    srid: int,
+) -> list[str | None]:
+    """Get the slope class of many points
+
+    Points not in the cache are resolved together in one query: a VALUES
+    list of the points joined LATERAL to the first intersecting polygon,
+    found through the GiST index on the shape column. Points are
+    transformed from their SRID to the SRID of the slope data.
+    """
+
+    keys = [(srid, x, y) for x, y in points]
+
+    # Results are read from this dict, the cache may evict entries of this
+    # batch before they are returned
+    slope_classes = {}
+    for key in set(keys):
+        if key in slope_cache:
+            slope_classes[key] = slope_cache.get(key)
+    missing = [key for key in set(keys) if key not in slope_classes]
+
+    if missing:
+        values_list = values(
+            column("idx", Integer),
+            column("x", Float),
+            column("y", Float),
+            name="points",
+            # Render the numbers inline, parameters in VALUES are untyped
+            literal_binds=True,
+        ).data([(i, x, y) for i, (_, x, y) in enumerate(missing)])
+
+        point = func.ST_Transform(
+            func.ST_SetSRID(
+                func.ST_MakePoint(values_list.c.x, values_list.c.y), srid
+            ),
+            SLOPE_SRID,
+        )
+        slope = (
+            select(HLAllgmeinZusammenfassungMerged.hl_neigung_hang)
+            .where(
+                func.ST_Intersects(
+                    HLAllgmeinZusammenfassungMerged.shape, point
+                )
+            )
+            .limit(1)
+            .lateral("slope")
+        )
+
+        res = await session.exec(
+            select(values_list.c.idx, slope.c.hl_neigung_hang)
+            .select_from(values_list)
+            .outerjoin(slope, true())
+        )
+        found = dict(res.all())
+        for idx, key in enumerate(missing):
+            slope_classes[key] = found.get(idx)
+            slope_cache.set(key, slope_classes[key])
+
+    return [slope_classes[key] for key in keys]
+
+
 @router.get("/slope", response_model=Slope)
 async def get_slope_class(
     x: float = Query(..., description="x coordinate"),
@@ -35,26 +129,32 @@ async def get_slope_class(
     srid: int = Query(2056, description="Spatial Reference Identifier"),
     session: AsyncSession = Depends(get_session),
 ) -> Slope:
-    """Get an sensordata by id"""
-    res = await session.exec(
-        select(HLAllgmeinZusammenfassungMerged).where(
-            func.ST_Intersects(
-                HLAllgmeinZusammenfassungMerged.shape,
-                func.ST_SetSRID(func.ST_MakePoint(x, y), srid),
-            )
-        )
-    )
+    """Get the slope class of a point"""
+
+    (slope_class,) = await get_slope_classes(session, [(x, y)], srid)
 
-    obj = res.first()
+    if not slope_class:
+        raise HTTPException(status_code=404, detail="No data found")
 
-    if not obj:
-        return HTTPException(status_code=404, detail="No data found")
+    return Slope(slope_class=slope_class)
 
-    return Slope(slope_class=obj.hl_neigung_hang)
 
+@router.post("/slope/batch", response_model=list[SlopePointRead])
+async def get_slope_classes_batch(
+    points: list[SlopePointCreate],
+    srid: int = Query(2056, description="Spatial Reference Identifier"),
+    session: AsyncSession = Depends(get_session),
+) -> list[SlopePointRead]:
+    """Get the slope class of many points at once"""
 
-class Elevation(SQLModel):
-    elevation: float
+    res = await get_slope_classes(
+        session, [(point.x, point.y) for point in points], srid
+    )
+
+    return [
+        SlopePointRead(x=point.x, y=point.y, slope_class=slope_class)
+        for point, slope_class in zip(points, res)
+    ]
 
 
 @router.get("/elevation", response_model=Elevation)
@@ -62,10 +162,37 @@ async def get_elevation(
     x: float = Query(..., description="x coordinate"),
     y: float = Query(..., description="y coordinate"),
     srid: int = Query(2056, description="Spatial Reference Identifier"),
-    session: AsyncSession = Depends(get_session),
 ) -> Elevation:
-    """Get an sensordata by id"""
+    """Get the elevation of a point"""
 
-    res = await get_elevation_swisstopo(x, y, srid)
+    res = await elevation.get_elevation(x, y, srid)
 
     return Elevation(elevation=res)
+
+
+@router.post("/elevation/batch", response_model=list[ElevationPointRead])
+async def get_elevations(
+    points: list[ElevationPointCreate],
+    srid: int = Query(2056, description="Spatial Reference Identifier"),
+) -> list[ElevationPointRead]:
+    """Get the elevation of many points at once"""
+
+    res = await elevation.get_elevations(
+        [point.x for point in points], [point.y for point in points], srid
+    )
+
+    return [
+        ElevationPointRead(
+            x=point.x,
+            y=point.y,
+            elevation=None if np.isnan(z) else z,
+        )
+        for point, z in zip(points, res.tolist())
+    ]
+
+
+@router.get("/compute", response_model=list[TaskMetrics])
+async def get_compute_metrics() -> list[TaskMetrics]:
+    """Get the timing metrics of the tasks run in the compute executor"""
+
+    return get_metrics()
@@ -19,6 +19,8 @@ from app.projects.models import Project  # noqa
 from app.transects.models.transects import Transect  # noqa
 from app.transects.models.nodes import TransectNode  # noqa
 from app.gnss.models import GNSS  # noqa
+from app.elevation.models import ElevationCache  # noqa
+from app.references.models import ReferenceVersion  # noqa
 from app.instruments.models.experiment import InstrumentExperimentRead  # noqa
 from app.instruments.channels.models import InstrumentExperimentChannel  # noqa
 
@@ -0,0 +1,67 @@
+"""Store area convex hull
+
+Revision ID: 5d0e8b7f4a21
+Revises: 376634bd3252
+Create Date: 2026-10-19 10:12:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from geoalchemy2 import Geometry
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0e8b7f4a21'
+down_revision: Union[str, None] = '376634bd3252'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'area',
+        sa.Column(
+            'geom',
+            Geometry(
+                geometry_type='POLYGON',
+                srid=4326,
+                spatial_index=False,
+                from_text='ST_GeomFromEWKT',
+                name='geometry',
+            ),
+            nullable=True,
+        ),
+    )
+
+    # Backfill with the buffered (10 m) convex hull of the points of each area
+    op.execute(
+        """
+        UPDATE area
+        SET geom = hull.geom
+        FROM (
+            SELECT
+                points.id,
+                ST_Transform(
+                    ST_Buffer(ST_ConvexHull(ST_Collect(points.geom)), 10.0),
+                    4326
+                ) AS geom
+            FROM (
+                SELECT area_id AS id, ST_Transform(geom, 2056) AS geom
+                FROM plot
+                UNION ALL
+                SELECT area_id, ST_Transform(geom, 2056) FROM soilprofile
+                UNION ALL
+                SELECT area_id, ST_Transform(geom, 2056) FROM sensor
+            ) AS points
+            GROUP BY points.id
+        ) AS hull
+        WHERE area.id = hull.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('area', 'geom')
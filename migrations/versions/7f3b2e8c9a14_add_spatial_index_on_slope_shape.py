@@ -0,0 +1,43 @@
+"""Add spatial index on slope shape
+
+Revision ID: 7f3b2e8c9a14
+Revises: e2a9c4d17b53
+Create Date: 2026-10-19 12:21:39.850172
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3b2e8c9a14'
+down_revision: Union[str, None] = 'e2a9c4d17b53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The slope class table is imported outside of the migrations, only add
+    # the index where it exists
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF to_regclass('hlallgmein_zusammenfassung_merged') IS NOT NULL
+            THEN
+                CREATE INDEX IF NOT EXISTS idx_hlallgmein_zusammenfassung_merged_shape
+                ON hlallgmein_zusammenfassung_merged USING gist (shape);
+            END IF;
+        END
+        $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        "DROP INDEX IF EXISTS idx_hlallgmein_zusammenfassung_merged_shape"
+    )
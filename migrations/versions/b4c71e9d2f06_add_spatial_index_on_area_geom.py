@@ -0,0 +1,28 @@
+"""Add spatial index on area geom
+
+Revision ID: b4c71e9d2f06
+Revises: 5d0e8b7f4a21
+Create Date: 2026-10-19 11:02:17.604583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4c71e9d2f06'
+down_revision: Union[str, None] = '5d0e8b7f4a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The plot, sensor and soilprofile geom columns already have GiST indexes
+    op.create_geospatial_index('idx_area_geom', 'area', ['geom'], unique=False, postgresql_using='gist', postgresql_ops={})
+
+
+def downgrade() -> None:
+    op.drop_geospatial_index('idx_area_geom', table_name='area', postgresql_using='gist', column_name='geom')